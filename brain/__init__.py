@@ -1,4 +1,30 @@
-from .concept_net.concept_net import ConceptNet
-from .database.read_sql import Database
-from .wiki.wiki_reader import WikiParser
-from .naive.neo4j_db import Neo4j
\ No newline at end of file
+""" Tools to mimic how the brain works in processing knowledge.
+
+The classes below are imported on first use (PEP 562), so `import brain`
+doesn't load requests, mysql.connector, the wiki parsers or the neo4j driver
+until the class needing them is used.
+"""
+from importlib import import_module
+
+# public name -> module defining it
+_lazy = {
+    "ConceptNet": ".concept_net.concept_net",
+    "Database": ".database.read_sql",
+    "WikiParser": ".wiki.wiki_reader",
+    "Neo4j": ".naive.neo4j_db",
+}
+
+__all__ = list(_lazy)
+
+
+def __getattr__(name: str):
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_lazy[name], __name__), name)
+    # cache it, so __getattr__ isn't called for this name again
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,163 @@
+""" Persistent on-disk cache for ConceptNet API responses. """
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from brain.paths import default_cache_dir
+
+
+class ResponseCache:
+    """SQLite backed cache for json responses, keyed by the request url (which
+    includes the language and the concept). Entries expire after the ttl, and
+    the least recently used entries are evicted once there are more than
+    max_entries of them. To keep hits read only, the time an entry was last
+    used is only refreshed once it's older than refresh seconds, which is
+    precise enough for picking what to evict.
+
+    :param path: sqlite file for the cache, defaults to conceptnet.sqlite in
+    the cache directory
+    :type path: Path, optional
+    :param ttl: seconds before an entry expires, None to never expire,
+    defaults to one week
+    :type ttl: float, optional
+    :param max_entries: maximum number of cached responses, defaults to 100000
+    :type max_entries: int, optional
+    :param refresh: seconds before the last use of an entry is updated again,
+    defaults to a tenth of the ttl, or an hour without a ttl
+    :type refresh: float, optional
+    """
+
+    def __init__(self,
+                 path: Path = None,
+                 ttl: Optional[float] = 7 * 24 * 3600,
+                 max_entries: int = 100000,
+                 refresh: Optional[float] = None):
+        self.path = Path(path) if path else \
+            default_cache_dir() / "conceptnet.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        if refresh is None:
+            refresh = ttl / 10 if ttl is not None else 3600
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(str(self.path),
+                                    timeout=30,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # with WAL, only a power loss can lose the last commits, which for a
+        #  cache is fine
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, "
+            "payload TEXT NOT NULL, "
+            "created REAL NOT NULL, "
+            "accessed REAL NOT NULL)")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed "
+            "ON responses (accessed)")
+        self.conn.commit()
+        self.size = self.conn.execute(
+            "SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, url: str) -> Optional[Dict]:
+        """Get a cached response
+
+        :param url: url of the request
+        :type url: str
+        :return: the json payload, None if it's not cached or expired
+        :rtype: Optional[Dict]
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT payload, created, accessed FROM responses "
+                "WHERE url = ?",
+                (url,)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            payload, created, accessed = row
+            if self.ttl is not None and now - created > self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE url = ?",
+                                  (url,))
+                self.conn.commit()
+                self.size -= 1
+                self.misses += 1
+                return None
+
+            if now - accessed > self.refresh:
+                self.conn.execute(
+                    "UPDATE responses SET accessed = ? WHERE url = ?",
+                    (now, url))
+                self.conn.commit()
+            self.hits += 1
+        return json.loads(payload)
+
+    def set(self, url: str, payload: Dict) -> None:
+        """Cache a response, evicting the least recently used ones if the
+        cache is full
+
+        :param url: url of the request
+        :type url: str
+        :param payload: json payload of the response
+        :type payload: Dict
+        """
+        now = time.time()
+        data = json.dumps(payload)
+        with self.lock:
+            cursor = self.conn.execute(
+                "UPDATE responses SET payload = ?, created = ?, accessed = ? "
+                "WHERE url = ?",
+                (data, now, now, url))
+            if cursor.rowcount == 0:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(url, payload, created, accessed) VALUES (?, ?, ?, ?)",
+                    (url, data, now, now))
+                self.size += 1
+
+            if self.size > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM responses WHERE url IN ("
+                    "SELECT url FROM responses ORDER BY accessed LIMIT ?)",
+                    (self.size - self.max_entries,))
+                self.size = self.conn.execute(
+                    "SELECT COUNT(*) FROM responses").fetchone()[0]
+            self.conn.commit()
+
+    def clear(self) -> None:
+        """Remove every cached response and reset the counters
+        """
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+            self.conn.commit()
+            self.size = 0
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Hit and miss counters of this cache
+
+        :return: hits, misses, hit rate and number of cached responses
+        :rtype: Dict[str, float]
+        """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": self.size}
+
+    def close(self) -> None:
+        """Close the sqlite connection
+        """
+        self.conn.close()
@@ -0,0 +1,110 @@
+""" Pooled http client used to talk to the ConceptNet API. """
+import threading
+import time
+from typing import Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class RateLimiter:
+    """Spread requests out so that at most `rate` requests per second are
+    started, shared by every thread using the client.
+
+    :param rate: requests per second, None for no limit
+    :type rate: float
+    """
+
+    def __init__(self,
+                 rate: Optional[float] = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Block until the next request is allowed to start
+        """
+        if not self.interval:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ConceptNetClient:
+    """Keep-alive http client with a connection pool, rate limiting and retry
+    with exponential backoff on connection errors and 429/5xx responses. It's
+    safe to share one client between threads.
+
+    :param pool_size: number of kept-alive connections per host, should be at
+    least the number of threads using the client, defaults to 16
+    :type pool_size: int, optional
+    :param rate: maximum requests per second, None for no limit
+    :type rate: float, optional
+    :param retries: number of retries for a failed request, defaults to 3
+    :type retries: int, optional
+    :param backoff_factor: base of the exponential backoff in seconds,
+    defaults to 0.5
+    :type backoff_factor: float, optional
+    :param timeout: request timeout in seconds, defaults to 30
+    :type timeout: float, optional
+    """
+
+    def __init__(self,
+                 pool_size: int = 16,
+                 rate: Optional[float] = None,
+                 retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 timeout: float = 30):
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate=rate)
+
+        retry = Retry(total=retries,
+                      backoff_factor=backoff_factor,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"]),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size,
+                              max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url: str) -> requests.Response:
+        """Send a GET request through the pool
+
+        :param url: the url to get
+        :type url: str
+        :return: the response
+        :rtype: requests.Response
+        """
+        self.rate_limiter.wait()
+        return self.session.get(url, timeout=self.timeout)
+
+    def close(self) -> None:
+        """Close the pooled connections
+        """
+        self.session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def default_client() -> ConceptNetClient:
+    """Get the client shared by every ConceptNet object that isn't given one
+
+    :return: the shared client
+    :rtype: ConceptNetClient
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = ConceptNetClient()
+    return _default_client
@@ -1,10 +1,12 @@
 """ User ConceptNet to find relations between concepts. """
-import requests
-from typing import List, Dict
+from typing import List, Dict, Optional, Iterable, Iterator
 from pprint import pprint
 from dataclasses import dataclass
 from enum import Enum
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from brain.concept_net.cache import ResponseCache
+from brain.concept_net.client import ConceptNetClient, default_client
 
 
 class RelationTypesEnum(Enum):
@@ -52,9 +54,40 @@ class ConceptNet():
     :type concept_name: str
     :param lang: language of the concept 
     :type lang: str
+    :param api_url: base url of the ConceptNet API
+    :type api_url: str
+    :param cache: optional on-disk cache for the API responses
+    :type cache: ResponseCache
+    :param client: http client used for the API, defaults to a shared pooled
+    keep-alive client
+    :type client: ConceptNetClient
     """
     concept_name: str
     lang: str = 'en'
+    api_url: str = 'https://api.conceptnet.io'
+    cache: Optional[ResponseCache] = None
+    client: Optional[ConceptNetClient] = None
+
+    def get_json(self, url: str) -> Dict:
+        """Get the json payload of an API url, using the cache if there is one.
+        Only successful responses are cached.
+
+        :param url: the API url
+        :type url: str
+        :return: the json payload
+        :rtype: Dict
+        """
+        if self.cache is not None:
+            obj = self.cache.get(url)
+            if obj is not None:
+                return obj
+
+        client = self.client or default_client()
+        response = client.get(url)
+        obj = response.json()
+        if self.cache is not None and response.ok:
+            self.cache.set(url, obj)
+        return obj
 
     def get_concepts(self) -> Dict:
         """Get the concept from ConceptNet. This will return all the concepts
@@ -63,10 +96,61 @@ class ConceptNet():
         :return: the payload regarding the concept
         :rtype: Dict
         """
-        url = f'https://api.conceptnet.io/c/{self.lang}/{self.concept_name}'
-        response = requests.get(url)
-        obj = response.json()
-        return obj
+        url = f'{self.api_url}/c/{self.lang}/{self.concept_name}'
+        return self.get_json(url)
+
+    def iter_pages(self,
+                   page_size: int = 1000,
+                   max_pages: int = None) -> Iterator[Dict]:
+        """Get the concept from ConceptNet page by page, following the
+        view.nextPage links of the API. Each page is a payload like the one
+        from `get_concepts`.
+
+        :param page_size: number of edges per page, defaults to 1000
+        :type page_size: int, optional
+        :param max_pages: stop after this many pages, defaults to all pages
+        :type max_pages: int, optional
+        :yield: the payload of each page
+        :rtype: Iterator[Dict]
+        """
+        url = f'{self.api_url}/c/{self.lang}/{self.concept_name}' \
+              f'?limit={page_size}'
+        pages = 0
+        while url:
+            page = self.get_json(url)
+            yield page
+            pages += 1
+
+            next_page = page.get('view', {}).get('nextPage')
+            if not next_page or (max_pages and pages >= max_pages):
+                return
+            url = f'{self.api_url}{next_page}'
+
+    @classmethod
+    def get_many(cls,
+                 concepts: Iterable[str],
+                 max_concurrency: int = 8,
+                 **kwargs) -> Dict[str, Dict]:
+        """Get many concepts from ConceptNet concurrently. The requests share
+        the pooled client, so the total time is bounded by the bandwidth and
+        the rate limit instead of the latency of each request.
+
+        :param concepts: names of the concepts to get
+        :type concepts: Iterable[str]
+        :param max_concurrency: maximum number of requests in flight, defaults
+        to 8
+        :type max_concurrency: int, optional
+        :param kwargs: other fields of ConceptNet, like lang, cache or client
+        :return: payload of each concept, keyed by concept name
+        :rtype: Dict[str, Dict]
+        """
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {
+                name: executor.submit(
+                    cls(concept_name=name, **kwargs).get_concepts)
+                for name in dict.fromkeys(concepts)}
+            return {name: future.result()
+                    for name, future in futures.items()}
 
     def format_for_neo4j(self,
                          conceptnet_output: Dict) -> Dict:
@@ -81,9 +165,9 @@ class ConceptNet():
         :rtype: Dict
         """
         interested_list = [x.value for x in RelationTypesEnum]
-        relations = [{'n1': edge['start']['@id'].split('/')[-1],
+        relations = [{'n1': self.concept_term(edge['start']['@id']),
                      'r': self.convert_relations(edge['rel']['label']),
-                     'n2': edge['end']['@id'].split('/')[-1]}
+                     'n2': self.concept_term(edge['end']['@id'])}
                      for edge in conceptnet_output['edges']
                      if edge['rel']['label'] in interested_list]
         return relations
@@ -120,6 +204,18 @@ class ConceptNet():
                     for x in RelationTypesEnum}
         return name_map[relation]
 
+    @staticmethod
+    def concept_term(uri: str) -> str:
+        """Get the term of a Concept Net concept uri, e.g. "wheel" for
+        "/c/en/wheel/n/wn/artifact"
+
+        :param uri: concept uri in the form of /c/<lang>/<term>[/...]
+        :type uri: str
+        :return: the term of the concept
+        :rtype: str
+        """
+        return uri.split('/')[3]
+
     def get_related_concepts(self) -> Dict:
         """Find all the related concepts. These concepts may not be directly
         related. 
@@ -127,12 +223,9 @@ class ConceptNet():
         :return: json for all the concepts related to the current concept
         :rtype: Dict
         """
-        url = f"https://api.conceptnet.io/related/c/{self.lang}/" \
+        url = f"{self.api_url}/related/c/{self.lang}/" \
               f'{self.concept_name}?filter=/c/{self.lang}'
-
-        response = requests.get(url)
-        obj = response.json()
-        return obj
+        return self.get_json(url)
 
     def find_relations(self,
                        target_concept: str) -> List[str]:
@@ -144,10 +237,9 @@ class ConceptNet():
         :return: list of relationship between the two concepts
         :rtype: List[str]
         """
-        url = f'http://api.conceptnet.io//query?node=/c/{self.lang}/' \
+        url = f'{self.api_url}/query?node=/c/{self.lang}/' \
               f'{self.concept_name}&other=/c/{self.lang}/{target_concept}'
-        response = requests.get(url)
-        obj = response.json()
+        obj = self.get_json(url)
         relations = [edge['surfaceText']
                      for edge in obj['edges'] if 'surfaceText' in edge]
         return relations
@@ -165,7 +257,8 @@ def get_args():
 
 def main():
     args = get_args()
-    concept = ConceptNet(concept_name=args.concept_name)
+    concept = ConceptNet(concept_name=args.concept_name,
+                         cache=ResponseCache())
     related = concept.get_concepts()
     relations = concept.display_edges(conceptnet_output=related)
     pprint(relations)
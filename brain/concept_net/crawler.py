@@ -0,0 +1,210 @@
+""" Breadth first expansion of the ConceptNet neighbourhood of concepts. """
+import argparse
+import hashlib
+import math
+from typing import Dict, Iterable, Iterator
+from loguru import logger
+from brain.concept_net.concept_net import ConceptNet, RelationTypesEnum
+from brain.naive.neo4j_db import Neo4j
+
+
+class BloomFilter:
+    """Compact set of strings with a small false positive rate, used to
+    remember visited concepts and edges without keeping them all in memory.
+    A false positive only means a concept or edge is skipped.
+
+    :param capacity: expected number of items, defaults to 1000000
+    :type capacity: int, optional
+    :param error_rate: false positive rate at capacity, defaults to 0.001
+    :type error_rate: float, optional
+    """
+
+    def __init__(self,
+                 capacity: int = 1000000,
+                 error_rate: float = 0.001):
+        self.size = math.ceil(-capacity * math.log(error_rate)
+                              / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        hash1 = int.from_bytes(digest[:8], 'little')
+        hash2 = int.from_bytes(digest[8:], 'little')
+        return ((hash1 + i * hash2) % self.size
+                for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        """Add an item to the filter
+
+        :param item: the item to add
+        :type item: str
+        """
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        """Check whether an item was probably added
+
+        :param item: the item to check
+        :type item: str
+        :return: False if the item was never added
+        :rtype: bool
+        """
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+
+class FrontierCrawler:
+    """Expand the neighbourhood of seed concepts hop by hop. Every page of
+    every concept is read by following the API pagination, the interesting
+    edges are streamed out as they are found (formatted with
+    `ConceptNet.format_for_neo4j`), and at most fan_out new concepts per
+    expanded concept are queued for the next hop.
+
+    :param hops: number of hops away from the seeds to expand, defaults to 2
+    :type hops: int, optional
+    :param fan_out: maximum number of new concepts queued from each expanded
+    concept, defaults to 20
+    :type fan_out: int, optional
+    :param lang: only follow concepts in this language, defaults to 'en'
+    :type lang: str, optional
+    :param page_size: number of edges per page, defaults to 1000
+    :type page_size: int, optional
+    :param max_pages: maximum number of pages read per concept, defaults to
+    all pages
+    :type max_pages: int, optional
+    :param use_bloom: remember visited concepts and edges in bloom filters
+    instead of sets, defaults to False
+    :type use_bloom: bool, optional
+    :param capacity: expected number of concepts and edges when using bloom
+    filters, defaults to 1000000
+    :type capacity: int, optional
+    :param kwargs: other fields of ConceptNet, like cache or client
+    """
+
+    def __init__(self,
+                 hops: int = 2,
+                 fan_out: int = 20,
+                 lang: str = 'en',
+                 page_size: int = 1000,
+                 max_pages: int = None,
+                 use_bloom: bool = False,
+                 capacity: int = 1000000,
+                 **kwargs):
+        self.hops = hops
+        self.fan_out = fan_out
+        self.lang = lang
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.concept_kwargs = kwargs
+
+        if use_bloom:
+            self.visited = BloomFilter(capacity=capacity)
+            self.seen_edges = BloomFilter(capacity=capacity)
+        else:
+            self.visited = set()
+            self.seen_edges = set()
+
+        self.concepts_expanded = 0
+        self.pages_read = 0
+        self.edges_found = 0
+
+    def crawl(self, seeds: Iterable[str]) -> Iterator[Dict]:
+        """Crawl from the seed concepts, yielding each edge once
+
+        :param seeds: names of the concepts to start from
+        :type seeds: Iterable[str]
+        :yield: edge as a dict with n1, r and n2
+        :rtype: Iterator[Dict]
+        """
+        interested_list = [x.value for x in RelationTypesEnum]
+        prefix = f"/c/{self.lang}/"
+
+        frontier = []
+        for seed in seeds:
+            if seed not in self.visited:
+                self.visited.add(seed)
+                frontier.append(seed)
+
+        for hop in range(self.hops):
+            next_frontier = []
+            for name in frontier:
+                concept = ConceptNet(concept_name=name,
+                                     lang=self.lang,
+                                     **self.concept_kwargs)
+                self.concepts_expanded += 1
+                queued = 0
+
+                for page in concept.iter_pages(
+                        page_size=self.page_size,
+                        max_pages=self.max_pages):
+                    self.pages_read += 1
+                    new_edges = []
+                    for edge in page.get('edges', []):
+                        if edge['rel']['label'] not in interested_list \
+                                or edge['@id'] in self.seen_edges:
+                            continue
+                        start = edge['start']['@id']
+                        end = edge['end']['@id']
+                        if not start.startswith(prefix) \
+                                or not end.startswith(prefix):
+                            continue
+
+                        self.seen_edges.add(edge['@id'])
+                        new_edges.append(edge)
+
+                        # queue the other side of the edge for the next hop
+                        other = concept.concept_term(
+                            end if concept.concept_term(start) == name
+                            else start)
+                        if queued < self.fan_out \
+                                and other not in self.visited:
+                            self.visited.add(other)
+                            next_frontier.append(other)
+                            queued += 1
+
+                    formatted = concept.format_for_neo4j(
+                        conceptnet_output={'edges': new_edges})
+                    self.edges_found += len(formatted)
+                    yield from formatted
+
+            logger.info(f"Hop {hop + 1}: expanded {self.concepts_expanded} "
+                        f"concepts, read {self.pages_read} pages, "
+                        f"found {self.edges_found} edges")
+            frontier = next_frontier
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description='Expand ConceptNet concepts into Neo4j')
+    parser.add_argument('-c',
+                        '--concepts',
+                        type=str,
+                        nargs='+',
+                        help='ConceptNet nodes to start from')
+    parser.add_argument('--hops',
+                        type=int,
+                        default=2,
+                        help='number of hops to expand')
+    parser.add_argument('--fan_out',
+                        type=int,
+                        default=20,
+                        help='new concepts queued per expanded concept')
+
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = get_args()
+    crawler = FrontierCrawler(hops=args.hops,
+                              fan_out=args.fan_out)
+    app = Neo4j()
+    app.create_edges(edges=crawler.crawl(seeds=args.concepts))
+    app.close()
+
+
+if __name__ == "__main__":
+    logger.add("concept_net_crawl.log")
+    main()
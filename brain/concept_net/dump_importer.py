@@ -0,0 +1,133 @@
+""" Import the offline ConceptNet assertions dump into Neo4j. """
+import argparse
+import gzip
+import time
+from pathlib import Path
+from typing import Dict, Iterator
+from loguru import logger
+from brain.concept_net.concept_net import ConceptNet, RelationTypesEnum
+from brain.naive.neo4j_db import Neo4j
+from brain.naive import utils
+
+
+class AssertionsImporter:
+    """Stream the gzipped ConceptNet assertions dump
+    (conceptnet-assertions-5.7.0.csv.gz) line by line and load the edges we
+    are interested in into Neo4j. Only one batch of edges is held in memory at
+    a time, so memory stays flat regardless of the size of the dump.
+
+    Each line of the dump is tab separated: assertion uri, relation uri, start
+    concept uri, end concept uri and a json blob with extra information.
+
+    :param dump_file: path to the gzipped assertions csv
+    :type dump_file: Path
+    :param lang: only keep edges with both concepts in this language
+    :type lang: str
+    """
+
+    def __init__(self,
+                 dump_file: Path,
+                 lang: str = 'en'):
+        self.dump_file = Path(dump_file)
+        self.lang = lang
+        self.rows_read = 0
+        self.edges_found = 0
+
+        # map relation uris to Neo4j relationship names once, instead of for
+        #  every row in the dump
+        self.relations = {
+            f"/r/{x.value}": ConceptNet.convert_relations(x.value)
+            for x in RelationTypesEnum}
+
+    def read_edges(self) -> Iterator[Dict]:
+        """Read the edges from the dump that have an interesting relation and
+        are in the requested language
+
+        :yield: edge as a dict with n1, r and n2
+        :rtype: Iterator[Dict]
+        """
+        prefix = f"/c/{self.lang}/"
+        with gzip.open(self.dump_file, 'rt', encoding='utf-8') as dump:
+            for line in dump:
+                self.rows_read += 1
+                fields = line.split('\t', 4)
+                if len(fields) < 4:
+                    continue
+
+                relation = self.relations.get(fields[1])
+                if relation is None \
+                        or not fields[2].startswith(prefix) \
+                        or not fields[3].startswith(prefix):
+                    continue
+
+                self.edges_found += 1
+                yield {'n1': ConceptNet.concept_term(fields[2]),
+                       'r': relation,
+                       'n2': ConceptNet.concept_term(fields[3])}
+
+    def run(self,
+            app: Neo4j,
+            node_type: str = "unknown",
+            batch_size: int = 5000) -> int:
+        """Load the dump into Neo4j in batches, reporting the throughput after
+        every batch
+
+        :param app: the Neo4j database to write to
+        :type app: Neo4j
+        :param node_type: node type used for the concepts, defaults to
+        "unknown"
+        :type node_type: str, optional
+        :param batch_size: number of edges written per batch, defaults to 5000
+        :type batch_size: int, optional
+        :return: number of edges written
+        :rtype: int
+        """
+        start = time.perf_counter()
+        written = 0
+        for batch in utils.batched(self.read_edges(), batch_size):
+            written += app.create_edges(edges=batch,
+                                        node_type=node_type,
+                                        batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Read {self.rows_read} rows "
+                        f"({self.rows_read / elapsed:.0f} rows/s), "
+                        f"wrote {written} edges "
+                        f"({written / elapsed:.0f} edges/s)")
+        return written
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description='Import the ConceptNet assertions dump into Neo4j')
+    parser.add_argument('-d',
+                        '--dump_file',
+                        type=Path,
+                        help='gzipped ConceptNet assertions csv')
+    parser.add_argument('-l',
+                        '--lang',
+                        type=str,
+                        default='en',
+                        help='language of the concepts to keep')
+    parser.add_argument('-b',
+                        '--batch_size',
+                        type=int,
+                        default=5000,
+                        help='number of edges written per batch')
+
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = get_args()
+    importer = AssertionsImporter(dump_file=args.dump_file,
+                                  lang=args.lang)
+    app = Neo4j()
+    importer.run(app=app,
+                 batch_size=args.batch_size)
+    app.close()
+
+
+if __name__ == "__main__":
+    logger.add("concept_net_import.log")
+    main()
@@ -1,37 +1,127 @@
 """ make a class that connects to the database """
 
-import mysql.connector as mysqlConnector
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterable, Iterator
+from mysql.connector import pooling
 
 
 class Database:
+    # connection pools shared by every Database with the same settings, with
+    #  a semaphore so threads wait for a free connection instead of failing
+    pools = {}
+    pools_lock = threading.Lock()
+
     def __init__(self,
                  host: str = "localhost",
                  user: str = "root",
                  password: str = "example",
-                 database: str = "test"):
-        self.conn = mysqlConnector.connect(host=host,
-                                           user=user,
-                                           passwd=password,
-                                           database=database)
-
-         # Checking if connection is made or not
-        if self.conn:
-            print("Connection Successful :)")
-        else:
-            print("Connection Failed :(")
+                 database: str = "test",
+                 pool_size: int = 5):
+        # every argument is in the key, so a different password or size
+        #  gets its own pool instead of silently sharing the first one
+        key = (host, user, password, database, pool_size)
+        with Database.pools_lock:
+            if key not in Database.pools:
+                pool = pooling.MySQLConnectionPool(
+                    pool_name=f"brain_{len(Database.pools)}",
+                    pool_size=pool_size,
+                    pool_reset_session=True,
+                    host=host,
+                    user=user,
+                    passwd=password,
+                    database=database)
+                Database.pools[key] = (pool,
+                                       threading.BoundedSemaphore(pool_size))
+                print("Connection Successful :)")
+        self.pool, self.semaphore = Database.pools[key]
+
+    @contextmanager
+    def connection(self):
+        ''' Borrow a connection from the pool. The connection is checked with
+        a ping first and reconnected if it was dropped, and it goes back to
+        the pool when the block exits. '''
+        with self.semaphore:
+            conn = self.pool.get_connection()
+            try:
+                conn.ping(reconnect=True, attempts=3, delay=1)
+                yield conn
+            finally:
+                # closing a pooled connection returns it to the pool
+                conn.close()
 
     def query(self,
-              query: str, 
+              query: str,
               params: tuple = None
               ) -> None:
-        cursor = self.conn.cursor()
-        try:
-            cursor.execute(query, params)
-            result = cursor.fetchall()
-        except Exception as e:
-            print("Invalid Query")
-            print(e)
-            result = None
-
-        cursor.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                result = cursor.fetchall()
+            except Exception as e:
+                print("Invalid Query")
+                print(e)
+                result = None
+
+            cursor.close()
         return result
+
+    def stream(self,
+               query: str,
+               params: tuple = None,
+               batch_size: int = 1000) -> Iterator[tuple]:
+        ''' Yield the rows of a query without loading the whole result in
+        memory. The cursor is unbuffered, so rows are read from the server
+        with fetchmany as they are consumed. The connection is held until the
+        generator is exhausted or closed. Closing it early drops the server
+        connection instead of reading the rows left. '''
+        with self.connection() as conn:
+            cursor = conn.cursor(buffered=False)
+            try:
+                cursor.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                # an unbuffered cursor can't be closed with rows left unread
+                if conn.unread_result:
+                    self._drop_result(conn)
+                cursor.close()
+
+    @staticmethod
+    def _drop_result(conn) -> None:
+        ''' Give up the unread result of a pooled connection. Reading it would
+        stream the rest of it from the server, e.g. a whole table after a
+        break out of a scan, so the server connection is closed instead, which
+        stops the query, and a new one is opened in its place before it goes
+        back to the pool. '''
+        # the connection inside the pooled one
+        cnx = conn._cnx
+        cnx.unread_result = False
+        cnx.reconnect()
+
+    def insert_many(self,
+                    query: str,
+                    rows: Iterable[tuple],
+                    batch_size: int = 1000) -> int:
+        ''' Insert rows with executemany, one multi-row statement and commit
+        per batch, and return the number of rows inserted '''
+        rows = iter(rows)
+        count = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    cursor.executemany(query, batch)
+                    conn.commit()
+                    count += len(batch)
+            finally:
+                cursor.close()
+        return count
@@ -0,0 +1,343 @@
+import asyncio
+from neo4j import AsyncGraphDatabase
+from loguru import logger
+from pathlib import Path
+from typing import List, Dict, Iterable
+from brain.naive import utils
+from brain.naive import cypher
+from brain.naive.neo4j_db import Neo4j, Neo4jEnums
+from neo4j.exceptions import ServiceUnavailable
+
+
+class AsyncNeo4j:
+    """Asynchronous counterpart of `Neo4j` built on the neo4j async driver.
+    Every call runs in its own session, so many queries can be in flight at
+    once (up to max_concurrency) when they are awaited together, e.g. with
+    `asyncio.gather`.
+
+    :param driver: an async driver, or anything with the same session API
+    such as an in-process fake, defaults to a driver using the credentials in
+    brain/naive/neo4j.json
+    :type driver: neo4j.AsyncDriver, optional
+    :param max_concurrency: maximum number of queries in flight, defaults to
+    100
+    :type max_concurrency: int, optional
+    """
+
+    def __init__(self,
+                 driver=None,
+                 max_concurrency: int = 100):
+        if driver is None:
+            # Load credential from secret file
+            credentials = utils.load_credentials(
+                secret_file=Path("brain/naive/neo4j.json"))
+            driver = AsyncGraphDatabase.driver(
+                uri=credentials[Neo4jEnums.URI.value],
+                auth=(credentials[Neo4jEnums.USER.value],
+                      credentials[Neo4jEnums.PASSWORD.value]))
+        self.driver = driver
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def close(self):
+        """Close the connections
+        """
+        await self.driver.close()
+
+    async def _write(self, work, *args):
+        """Run a transaction function in a write transaction
+
+        :param work: the transaction function
+        :type work: Callable
+        :return: what the transaction function returns
+        """
+        async with self.semaphore:
+            async with self.driver.session(
+                    database=Neo4jEnums.NEO4J.value) as session:
+                return await session.execute_write(work, *args)
+
+    async def _read(self, work, *args):
+        """Run a transaction function in a read transaction
+
+        :param work: the transaction function
+        :type work: Callable
+        :return: what the transaction function returns
+        """
+        async with self.semaphore:
+            async with self.driver.session(
+                    database=Neo4jEnums.NEO4J.value) as session:
+                return await session.execute_read(work, *args)
+
+    @staticmethod
+    async def _rows(query: str, result) -> List:
+        """Read all the rows of a result
+
+        :param query: the query, used for logging errors
+        :type query: str
+        :param result: the async result
+        :type result: neo4j.AsyncResult
+        :return: the rows
+        :rtype: List
+        """
+        try:
+            return [row async for row in result]
+        # Capture any errors along with the query and data for traceability
+        except ServiceUnavailable as exception:
+            logger.error(f"{query} raised an error: \n {exception}")
+            raise
+
+    async def create_node(self,
+                          node_type: str,
+                          node_name: str) -> None:
+        """Create a node in the database
+
+        :param node_type: type of node
+        :type node_type: str
+        :param node_name: name of the node
+        :type node_name: str
+        """
+        result = await self._write(self._create_node, node_type, node_name)
+        for row in result:
+            logger.info(f"Created node {row['n']}")
+
+    @classmethod
+    async def _create_node(cls,
+                           tx,
+                           node_type: str,
+                           node_name: str) -> List[Dict]:
+        query = cypher.create_node(node_type)
+        result = await tx.run(query, node_name=node_name)
+        rows = await cls._rows(query, result)
+        return [{"n": row["n"]["name"]} for row in rows]
+
+    async def create_edge(self,
+                          edge: str,
+                          node1_type: str,
+                          node2_type: str,
+                          node1_name: str,
+                          node2_name: str) -> List[Dict]:
+        """Create a relationship with two nodes, or strengthen it if it
+        already exists. Nodes and relationship are merged in one statement,
+        so concurrent calls don't race each other.
+
+        :param edge: indicate the relaitonship between two nodes
+        :type edge: str
+        :param node1_type: indicate the type of node 1
+        :type node1_type: str
+        :param node2_type: indicate the type of node 2
+        :type node2_type: str
+        :param node1_name: name of node one
+        :type node1_name: str
+        :param node2_name: name of node two
+        :type node2_name: str
+        :return: the relationship with its new confidence
+        :rtype: List[Dict]
+        """
+        return await self._write(self._create_edges,
+                                 [{"n1": node1_name,
+                                   "r": edge,
+                                   "n2": node2_name,
+                                   "t1": node1_type,
+                                   "t2": node2_type}],
+                                 node1_type)
+
+    async def create_edges(self,
+                           edges: Iterable[Dict],
+                           node_type: str = "unknown",
+                           batch_size: int = 500) -> int:
+        """Create many relationships, one transaction per batch. See
+        `Neo4j.create_edges`.
+
+        :param edges: edges as dicts with n1, r, n2 and optional t1, t2
+        :type edges: Iterable[Dict]
+        :param node_type: node type used when an edge doesn't give t1 or t2,
+        defaults to "unknown"
+        :type node_type: str, optional
+        :param batch_size: number of edges written per transaction, defaults
+        to 500
+        :type batch_size: int, optional
+        :return: number of edges written
+        :rtype: int
+        """
+        total = 0
+        for batch in utils.batched(edges, batch_size):
+            result = await self._write(self._create_edges, batch, node_type)
+            total += len(result)
+            logger.info(f"Created or strengthened {len(result)} "
+                        f"relationships ({total} so far)")
+        return total
+
+    @classmethod
+    async def _create_edges(cls,
+                            tx,
+                            edges: List[Dict],
+                            node_type: str,
+                            confidence: float = 0.5,
+                            increase_factor: float = 0.10) -> List[Dict]:
+        all_results = []
+        groups = Neo4j.group_edges(edges=edges,
+                                   node_type=node_type)
+        for (node1_type, node2_type, edge), rows in groups.items():
+            query = cypher.create_edges(node1_type, node2_type, edge)
+            result = await tx.run(query,
+                                  rows=rows,
+                                  confidence=confidence,
+                                  increase_factor=increase_factor)
+            all_results.extend([{"n1": row["n1"]["name"],
+                                 "r": edge,
+                                 "confidence": row["r"]["confidence"],
+                                 "n2": row["n2"]["name"]}
+                                for row in await cls._rows(query, result)])
+        return all_results
+
+    async def find_edge(self,
+                        edge: str,
+                        node1_type: str,
+                        node2_type: str,
+                        node1_name: str,
+                        node2_name: str) -> List[Dict[str, str]]:
+        """Find a relationship with two nodes. The relationship is
+        unidirectional.
+
+        :param edge: indicate the relaitonship between two nodes
+        :type edge: str
+        :param node1_type: indicate the type of node 1
+        :type node1_type: str
+        :param node2_type: indicate the type of node 2
+        :type node2_type: str
+        :param node1_name: name of node one
+        :type node1_name: str
+        :param node2_name: name of node two
+        :type node2_name: str
+        :return: List of Dict
+        :rtype: List[Dict[str,str]]
+        """
+        return await self._read(self._find_edge, edge, node1_type,
+                                node2_type, node1_name, node2_name)
+
+    @classmethod
+    async def _find_edge(cls,
+                         tx,
+                         edge: str,
+                         node1_type: str,
+                         node2_type: str,
+                         node1_name: str,
+                         node2_name: str) -> List[Dict]:
+        query = cypher.find_edge(node1_type, node2_type, edge)
+        result = await tx.run(query,
+                              node1_name=node1_name,
+                              node2_name=node2_name)
+        return [{"n1": row["n1"]["name"],
+                 "n2": row["n2"]["name"],
+                 "r": edge,
+                 "confidence": row["r"]["confidence"]}
+                for row in await cls._rows(query, result)]
+
+    async def find_all_edge(self,
+                            node_type: str,
+                            node_name: str,
+                            limit: int = None,
+                            rel_types: Iterable[str] = None,
+                            min_confidence: float = None
+                            ) -> List[Dict[str, str]]:
+        """Find all relationships going out of or coming into a node. See
+        `Neo4j.find_all_edge`.
+
+        :param node_type: indicate the type of node, None for any type
+        :type node_type: str
+        :param node_name: name of node
+        :type node_name: str
+        :param limit: return only this many relationships, the most confident
+        ones, None for all of them, defaults to None
+        :type limit: int, optional
+        :param rel_types: only return relationships of these types, None for
+        any type, defaults to None
+        :type rel_types: Iterable[str], optional
+        :param min_confidence: only return relationships with at least this
+        confidence, defaults to None
+        :type min_confidence: float, optional
+        :return: List of Dict
+        :rtype: List[Dict[str,str]]
+        """
+        rel_types = tuple(sorted(rel_types)) if rel_types else ()
+        return await self._read(self._find_all_edge, node_type, node_name,
+                                limit, rel_types, min_confidence)
+
+    @classmethod
+    async def _find_all_edge(cls,
+                             tx,
+                             node_type: str,
+                             node_name: str,
+                             limit: int = None,
+                             rel_types: tuple = (),
+                             min_confidence: float = None) -> List[Dict]:
+        query = cypher.neighbourhood(node_type,
+                                     rel_types,
+                                     min_confidence is not None,
+                                     limit is not None)
+        result = await tx.run(query,
+                              node_name=node_name,
+                              limit=limit,
+                              min_confidence=min_confidence)
+        return [{"n1": row["n1"]["name"],
+                 "r": str(row['r'].type),
+                 "c": row['r']['confidence'],
+                 "n2": row["n2"]["name"]}
+                for row in await cls._rows(query, result)]
+
+    async def find_node(self,
+                        node_name: str,
+                        node_type: str = None) -> List[str]:
+        """Find the node in neo4j database
+
+        :param node_name: name of node
+        :type node_name: str
+        :param node_type: type of node
+        :type node_type: str
+        :return: names of the nodes found
+        :rtype: List[str]
+        """
+        return await self.find_nodes(node_names=[node_name],
+                                     node_type=node_type)
+
+    async def find_nodes(self,
+                         node_names: Iterable[str],
+                         node_type: str = None) -> List[str]:
+        """Find many nodes with one query
+
+        :param node_names: names of the nodes
+        :type node_names: Iterable[str]
+        :param node_type: type of the nodes
+        :type node_type: str
+        :return: names of the nodes found
+        :rtype: List[str]
+        """
+        return await self._read(self._find_nodes, node_type,
+                                list(node_names))
+
+    @classmethod
+    async def _find_nodes(cls,
+                          tx,
+                          node_type: str,
+                          node_names: List[str]) -> List[str]:
+        query = cypher.find_nodes(node_type)
+        result = await tx.run(query, node_names=node_names)
+        return [row["name"] for row in await cls._rows(query, result)]
+
+
+async def main():
+    app = AsyncNeo4j()
+    await app.create_edges(edges=[{"n1": "Yang",
+                                   "r": "KNOWS",
+                                   "n2": "Fangfang"}],
+                           node_type="Person")
+    edges = await asyncio.gather(
+        app.find_all_edge(node_type="Person", node_name="Yang"),
+        app.find_all_edge(node_type="Person", node_name="Fangfang"))
+    for edge in edges:
+        utils.display_edge(edges=edge)
+    await app.close()
+
+
+if __name__ == "__main__":
+    logger.add("Neo4j.log")
+    asyncio.run(main())
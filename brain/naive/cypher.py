@@ -0,0 +1,299 @@
+""" Cypher statements used by the Neo4j classes.
+
+Node names, confidence and other values are always passed as query
+parameters, so the text of a statement only depends on the labels and the
+relationship type. Those can't be parameters in Cypher, so each builder is
+cached by them: the same string is reused for every call, and the server's
+query plan cache gets a hit instead of parsing and planning a new query.
+"""
+from functools import lru_cache
+from typing import Optional, Tuple
+
+STATEMENT_CACHE_SIZE = 1024
+
+# every node also gets this label, so lookups without a node type can use the
+#  index on it instead of scanning the whole graph
+BASE_LABEL = "Concept"
+# node type of lookups matching nodes with any labels, for graphs where the
+#  base label hasn't been added to the older nodes yet
+ANY_LABEL = ""
+
+
+def quote(name: str) -> str:
+    """Quote a label or relationship type so any name is safe in a query
+
+    :param name: label or relationship type
+    :type name: str
+    :return: the name quoted with backticks
+    :rtype: str
+    """
+    return "`" + name.replace("`", "``") + "`"
+
+
+def label(node_type: Optional[str]) -> str:
+    """Label part of a node pattern, the base label if there is no node type
+    and nothing for ANY_LABEL
+
+    :param node_type: type of the node
+    :type node_type: Optional[str]
+    :return: e.g. ":`Person`"
+    :rtype: str
+    """
+    if node_type == ANY_LABEL:
+        return ""
+    return f":{quote(node_type or BASE_LABEL)}"
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def create_node(node_type: str) -> str:
+    """Create a node named $node_name"""
+    return (
+        f"CREATE (n{label(node_type)}{label(BASE_LABEL)} "
+        f"{{ name: $node_name }}) "
+        f"RETURN n"
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def find_node(node_type: Optional[str]) -> str:
+    """Find nodes named $node_name"""
+    return (
+        f"MATCH (p{label(node_type)}) "
+        f"WHERE p.name = $node_name "
+        f"RETURN p.name AS name"
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def find_nodes(node_type: Optional[str]) -> str:
+    """Find the nodes with a name in $node_names"""
+    return (
+        f"MATCH (p{label(node_type)}) "
+        f"WHERE p.name IN $node_names "
+        f"RETURN p.name AS name"
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def create_edge(node1_type: str, node2_type: str, edge: str) -> str:
+    """Create a relationship with $confidence between $node1_name and
+    $node2_name"""
+    return (
+        f"MATCH (n1{label(node1_type)} {{ name: $node1_name }}), "
+        f"(n2{label(node2_type)} {{ name: $node2_name }}) "
+        f"CREATE (n1)-[r:{quote(edge)} "
+        f"{{ confidence: $confidence, updated: timestamp() }}]->(n2) "
+        f"RETURN n1, n2"
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def modify_edge(node1_type: str, node2_type: str, edge: str) -> str:
+    """Set the confidence of the relationship between $node1_name and
+    $node2_name to $confidence"""
+    return (
+        f"MATCH (n1{label(node1_type)} {{ name: $node1_name }})"
+        f"-[r:{quote(edge)}]->"
+        f"(n2{label(node2_type)} {{ name: $node2_name }}) "
+        f"SET r.confidence = $confidence, r.updated = timestamp() "
+        f"RETURN n1, n2"
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def find_edge(node1_type: str, node2_type: str, edge: str) -> str:
+    """Find the relationship between $node1_name and $node2_name"""
+    return (
+        f"MATCH (n1{label(node1_type)})-[r:{quote(edge)}]->"
+        f"(n2{label(node2_type)}) "
+        f"WHERE n1.name = $node1_name AND n2.name = $node2_name "
+        f"RETURN n1, n2, r"
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def neighbourhood(node_type: Optional[str],
+                  rel_types: Tuple[str, ...] = (),
+                  min_confidence: bool = False,
+                  limit: bool = False) -> str:
+    """Find the relationships of $node_name in both directions at once, only
+    of the given types if any. With min_confidence only the relationships
+    with at least $min_confidence are kept, and with limit only the $limit
+    most confident ones are returned."""
+    types = ":" + "|".join(quote(t) for t in rel_types) if rel_types else ""
+    return (
+        f"MATCH (n{label(node_type)} {{ name: $node_name }})-[r{types}]-() "
+        + ("WHERE r.confidence >= $min_confidence " if min_confidence else "")
+        + "RETURN startNode(r) AS n1, r, endNode(r) AS n2"
+        + (" ORDER BY r.confidence DESC LIMIT $limit" if limit else "")
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def recall(node_type: Optional[str], hops: int) -> str:
+    """Spread activation from the nodes named in $seeds over up to hops
+    relationships in either direction, one hop per stage so paths are never
+    enumerated. Every hop activates the neighbours of the frontier by
+    activation * confidence * $decay and keeps the best path to each node,
+    dropping paths below $threshold. Only then are the distinct nodes checked
+    against the earlier hops, and the $max_frontier most activated of those
+    that improved are kept and expanded next, so every check scans at most
+    hops * $max_frontier earlier results. Returns the $top_k most activated
+    nodes with their best path."""
+    stage = (
+        "CALL { WITH frontier "
+        "UNWIND frontier AS f "
+        "WITH f, f.node AS m "
+        "MATCH (m)-[r]-(n) "
+        "WITH n, f.path + n.name AS path, "
+        "f.activation * coalesce(r.confidence, 0) * $decay AS activation "
+        "WHERE activation >= $threshold "
+        "WITH n, activation, path ORDER BY activation DESC "
+        "WITH n, collect({activation: activation, path: path})[0] AS best "
+        "ORDER BY best.activation DESC "
+        "RETURN collect({node: n, activation: best.activation, "
+        "path: best.path}) AS candidates } "
+        "WITH results, [x IN candidates WHERE NOT any(y IN results "
+        "WHERE y.node = x.node AND y.activation >= x.activation)]"
+        "[..$max_frontier] AS reached "
+        "WITH results + reached AS results, reached AS frontier "
+    )
+    return (
+        f"MATCH (s{label(node_type)}) WHERE s.name IN $seeds "
+        f"WITH collect({{node: s, activation: 1.0, path: [s.name]}}) "
+        "AS results "
+        "WITH results, results AS frontier "
+        + stage * int(hops) +
+        "UNWIND results AS x "
+        "WITH x ORDER BY x.activation DESC "
+        "WITH x.node AS n, collect(x)[0] AS best "
+        "WHERE NOT n.name IN $seeds "
+        "RETURN n.name AS name, best.activation AS activation, "
+        "best.path AS path "
+        "ORDER BY activation DESC LIMIT $top_k"
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def create_edges(node1_type: str, node2_type: str, edge: str) -> str:
+    """Upsert a list of $rows of n1, n2 names and count. New relationships
+    get $confidence and existing ones are strengthened by $increase_factor
+    like `Neo4j.calculate_confidence`, applied count times (count - 1 times
+    after creating). The time they were last strengthened is kept in
+    r.updated."""
+    return (
+        f"UNWIND $rows AS row "
+        f"MERGE (n1{label(node1_type)} {{ name: row.n1 }}) "
+        f"ON CREATE SET n1{label(BASE_LABEL)} "
+        f"MERGE (n2{label(node2_type)} {{ name: row.n2 }}) "
+        f"ON CREATE SET n2{label(BASE_LABEL)} "
+        f"MERGE (n1)-[r:{quote(edge)}]->(n2) "
+        f"ON CREATE SET r.confidence = reduce(c = $confidence, "
+        f"i IN range(2, row.count) | "
+        f"round(c + (1 - c) * $increase_factor, 3)) "
+        f"ON MATCH SET r.confidence = reduce(c = r.confidence, "
+        f"i IN range(1, row.count) | "
+        f"round(c + (1 - c) * $increase_factor, 3)) "
+        f"SET r.updated = timestamp() "
+        f"RETURN n1, n2, r"
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def merge_nodes(node_type: str) -> str:
+    """Create the nodes named in $names that don't exist yet"""
+    return (
+        f"UNWIND $names AS name "
+        f"MERGE (n{label(node_type)} {{ name: name }}) "
+        f"ON CREATE SET n{label(BASE_LABEL)} "
+        f"RETURN count(n) AS count"
+    )
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def restore_edges(node1_type: str, node2_type: str, edge: str) -> str:
+    """Create or overwrite a list of $rows of n1, n2 names with the exact
+    confidence of each row"""
+    return (
+        f"UNWIND $rows AS row "
+        f"MERGE (n1{label(node1_type)} {{ name: row.n1 }}) "
+        f"ON CREATE SET n1{label(BASE_LABEL)} "
+        f"MERGE (n2{label(node2_type)} {{ name: row.n2 }}) "
+        f"ON CREATE SET n2{label(BASE_LABEL)} "
+        f"MERGE (n1)-[r:{quote(edge)}]->(n2) "
+        f"SET r.confidence = row.confidence "
+        f"RETURN count(r) AS count"
+    )
+
+
+def unique_name(node_type: str) -> str:
+    """Uniqueness constraint, and so an index, on the names of a node type"""
+    return (
+        f"CREATE CONSTRAINT IF NOT EXISTS "
+        f"FOR (n{label(node_type)}) REQUIRE n.name IS UNIQUE"
+    )
+
+
+def name_index(node_type: str) -> str:
+    """Index on the names of a node type"""
+    return (
+        f"CREATE INDEX IF NOT EXISTS "
+        f"FOR (n{label(node_type)}) ON (n.name)"
+    )
+
+
+def add_base_label(batch_size: int) -> str:
+    """Add the base label to the nodes created before it existed, committing
+    every batch_size nodes. Must run in an auto-commit transaction."""
+    return (
+        f"MATCH (n) WHERE NOT n{label(BASE_LABEL)} "
+        f"CALL {{ WITH n SET n{label(BASE_LABEL)} }} "
+        f"IN TRANSACTIONS OF {int(batch_size)} ROWS"
+    )
+
+
+def decay_edges(batch_size: int) -> str:
+    """Decay the confidence of every relationship by half every $half_life
+    milliseconds since it was last strengthened or decayed, and delete the
+    ones that fall below $floor. Time written by a clock ahead of the server
+    counts as none, so the confidence never grows past 1. Commits every
+    batch_size relationships and returns a row per relationship. Must run in
+    an auto-commit transaction."""
+    return (
+        "MATCH ()-[r]->() WHERE r.confidence IS NOT NULL "
+        "WITH r, timestamp() AS now "
+        "CALL { WITH r, now "
+        "WITH r, now, CASE WHEN r.decayed IS NULL OR r.updated > r.decayed "
+        "THEN coalesce(r.updated, now) ELSE r.decayed END AS since "
+        "WITH r, now, r.confidence * 0.5 ^ (toFloat(CASE WHEN now > since "
+        "THEN now - since ELSE 0 END) / $half_life) AS confidence "
+        "WITH r, now, CASE WHEN confidence > 1 THEN 1.0 ELSE confidence END "
+        "AS confidence "
+        "SET r.confidence = confidence, r.decayed = now "
+        "FOREACH (x IN CASE WHEN confidence < $floor THEN [1] ELSE [] END | "
+        "DELETE r) "
+        "RETURN confidence < $floor AS deleted "
+        f"}} IN TRANSACTIONS OF {int(batch_size)} ROWS "
+        "RETURN deleted"
+    )
+
+
+LABELS = "CALL db.labels() YIELD label RETURN label"
+
+NAME_INDEXES = (
+    "SHOW INDEXES YIELD entityType, labelsOrTypes, properties "
+    "WHERE entityType = 'NODE' AND properties = ['name'] "
+    "RETURN labelsOrTypes"
+)
+
+ALL_NODES = (
+    "MATCH (n) WHERE n.name IS NOT NULL "
+    "RETURN elementId(n) AS id, n.name AS name, labels(n) AS labels"
+)
+
+ALL_EDGES = (
+    "MATCH (n1)-[r]->(n2) "
+    "WHERE n1.name IS NOT NULL AND n2.name IS NOT NULL "
+    "RETURN elementId(n1) AS n1, type(r) AS r, "
+    "r.confidence AS confidence, elementId(n2) AS n2"
+)
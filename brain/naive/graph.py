@@ -0,0 +1,32 @@
+""" Open the graph backend chosen in brain/naive/neo4j.json. """
+from pathlib import Path
+from typing import Union
+from brain.naive import utils
+from brain.naive.neo4j_db import Neo4j, Neo4jEnums
+from brain.naive.local_db import LocalGraph
+
+NEO4J = "neo4j"
+LOCAL = "local"
+
+
+def open_graph(config_file: Path = Path("brain/naive/neo4j.json"),
+               **kwargs) -> Union[Neo4j, LocalGraph]:
+    """Open the graph backend set by "backend" in the config file. "neo4j"
+    (the default) connects to the Neo4j server in the same file, and "local"
+    opens an embedded `LocalGraph` stored in the sqlite file at "path", or
+    only in memory if there is no path.
+
+    :param config_file: json config file, defaults to brain/naive/neo4j.json
+    :type config_file: Path, optional
+    :param kwargs: keyword arguments for `Neo4j`, e.g. buffer_size or
+    cache_size, not used by the local backend
+    :return: the graph
+    :rtype: Union[Neo4j, LocalGraph]
+    """
+    config = utils.load_credentials(secret_file=config_file)
+    backend = config.get(Neo4jEnums.BACKEND.value, NEO4J)
+    if backend == LOCAL:
+        return LocalGraph(path=config.get(Neo4jEnums.PATH.value))
+    if backend == NEO4J:
+        return Neo4j(**kwargs)
+    raise ValueError(f"Unknown graph backend {backend} in {config_file}")
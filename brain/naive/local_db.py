@@ -0,0 +1,601 @@
+import heapq
+import sqlite3
+import threading
+import time
+from loguru import logger
+from pathlib import Path
+from typing import List, Dict, Iterable, Tuple
+from brain.naive import utils
+from brain.naive import cypher
+from brain.naive.neo4j_db import Neo4j
+from brain.naive.snapshot import SnapshotWriter, read_snapshot
+
+
+class LocalGraph:
+    """Embedded replacement for `Neo4j` with the same methods, for single
+    machine use and tests. The graph is kept in memory as adjacency dicts
+    indexed by node type and name, so lookups don't leave the process. Nodes
+    are identified by type and name like a node label and name in Neo4j.
+
+    :param path: sqlite file the graph is loaded from and written through to,
+    None to keep it in memory only, defaults to None
+    :type path: Path, optional
+    """
+
+    def __init__(self, path: Path = None):
+        self.lock = threading.RLock()
+
+        # node name -> node types, and node type -> node names
+        self.types_by_name = {}
+        self.names_by_type = {}
+        # (type, name) -> {(relationship, type, name): properties}
+        self.outgoing = {}
+        self.incoming = {}
+
+        self.path = Path(path) if path else None
+        self.conn = None
+        if self.path is not None:
+            self._open()
+
+    def _open(self) -> None:
+        """Open the sqlite file and load the graph in memory
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS nodes "
+                          "(type TEXT, name TEXT, "
+                          "PRIMARY KEY (type, name))")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS edges "
+                          "(t1 TEXT, n1 TEXT, r TEXT, t2 TEXT, n2 TEXT, "
+                          "confidence REAL, updated REAL, decayed REAL, "
+                          "PRIMARY KEY (t1, n1, r, t2, n2))")
+        # files written before edges had timestamps
+        columns = {row[1] for row in
+                   self.conn.execute("PRAGMA table_info(edges)")}
+        for column in ("updated", "decayed"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE edges "
+                                  f"ADD COLUMN {column} REAL")
+        self.conn.commit()
+
+        for node_type, node_name in self.conn.execute(
+                "SELECT type, name FROM nodes"):
+            self._add_node(node_type, node_name)
+        for node1_type, node1_name, edge, node2_type, node2_name, \
+                confidence, updated, decayed in self.conn.execute(
+                    "SELECT t1, n1, r, t2, n2, confidence, updated, decayed "
+                    "FROM edges"):
+            properties = self._add_edge((node1_type, node1_name), edge,
+                                        (node2_type, node2_name))
+            properties.update(confidence=confidence,
+                              updated=updated,
+                              decayed=decayed)
+        logger.info(f"Loaded {len(self.types_by_name)} node names "
+                    f"from {self.path}")
+
+    def close(self):
+        """Close the sqlite file if there is one
+        """
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def flush(self) -> int:
+        """Nothing is buffered, every write is already stored
+
+        :return: 0
+        :rtype: int
+        """
+        return 0
+
+    def _add_node(self, node_type: str, node_name: str) -> bool:
+        """Add a node to the indexes
+
+        :return: whether the node is new
+        :rtype: bool
+        """
+        types = self.types_by_name.setdefault(node_name, set())
+        if node_type in types:
+            return False
+        types.add(node_type)
+        self.names_by_type.setdefault(node_type, set()).add(node_name)
+        return True
+
+    def _add_edge(self,
+                  node1: Tuple[str, str],
+                  edge: str,
+                  node2: Tuple[str, str]) -> Dict:
+        """Get the properties of an edge, adding the edge if it's new
+
+        :return: properties of the edge, empty if it's new
+        :rtype: Dict
+        """
+        self._add_node(*node1)
+        self._add_node(*node2)
+        properties = self.outgoing.setdefault(node1, {}).setdefault(
+            (edge, *node2), {})
+        self.incoming.setdefault(node2, {})[(edge, *node1)] = properties
+        return properties
+
+    def _store_edges(self, edges: List[Tuple]) -> None:
+        """Write edges and their nodes to the sqlite file if there is one
+
+        :param edges: (node1, relationship, node2, properties) of each edge
+        :type edges: List[Tuple]
+        """
+        if self.conn is None:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO nodes VALUES (?, ?)",
+                {node for node1, _, node2, _ in edges
+                 for node in (node1, node2)})
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO edges "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(*node1, edge, *node2,
+                  properties.get("confidence"),
+                  properties.get("updated"),
+                  properties.get("decayed"))
+                 for node1, edge, node2, properties in edges])
+
+    def create_node(self,
+                    node_type: str,
+                    node_name: str) -> None:
+        """Create a node, nodes that already exist are left as they are
+
+        :param node_type: type of node
+        :type node_type: str
+        :param node_name: name of the node
+        :type node_name: str
+        """
+        node_type = node_type or cypher.BASE_LABEL
+        with self.lock:
+            if not self._add_node(node_type, node_name):
+                return
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute("INSERT OR IGNORE INTO nodes "
+                                      "VALUES (?, ?)",
+                                      (node_type, node_name))
+        logger.info(f"Created node {node_name}")
+
+    def create_edge(self,
+                    edge: str,
+                    node1_type: str,
+                    node2_type: str,
+                    node1_name: str,
+                    node2_name: str,
+                    upsert: bool = True):
+        """Create a relationship with two nodes, or strengthen it if it
+        already exists. See `Neo4j.create_edge`.
+
+        :param edge: indicate the relaitonship between two nodes
+        :type edge: str
+        :param node1_type: indicate the type of node 1
+        :type node1_type: str
+        :param node2_type: indicate the type of node 2
+        :type node2_type: str
+        :param node1_name: name of node one
+        :type node1_name: str
+        :param node2_name: name of node two
+        :type node2_name: str
+        :param upsert: kept for compatibility with `Neo4j.create_edge`, edges
+        are always upserted
+        :type upsert: bool, optional
+        """
+        for row in self._create_edges([{"n1": node1_name,
+                                        "r": edge,
+                                        "n2": node2_name,
+                                        "t1": node1_type,
+                                        "t2": node2_type}],
+                                      node1_type):
+            logger.info(f"Relationship {edge} between {row['n1']} "
+                        f"and {row['n2']} has confidence "
+                        f"{row['confidence']}")
+
+    def create_edges(self,
+                     edges: Iterable[Dict],
+                     node_type: str = "unknown",
+                     batch_size: int = 500) -> int:
+        """Create many relationships at once. See `Neo4j.create_edges`.
+
+        :param edges: edges as dicts with n1, r, n2 and optional t1, t2 and
+        count
+        :type edges: Iterable[Dict]
+        :param node_type: node type used when an edge doesn't give t1 or t2,
+        defaults to "unknown"
+        :type node_type: str, optional
+        :param batch_size: number of edges written per sqlite transaction,
+        defaults to 500
+        :type batch_size: int, optional
+        :return: number of edges written
+        :rtype: int
+        """
+        total = 0
+        for batch in utils.batched(edges, batch_size):
+            total += len(self._create_edges(batch, node_type))
+        logger.info(f"Created or strengthened {total} relationships")
+        return total
+
+    def _create_edges(self,
+                      edges: List[Dict],
+                      node_type: str,
+                      confidence: float = 0.5,
+                      increase_factor: float = 0.10) -> List[Dict]:
+        """Upsert edges in memory and in the sqlite file in one transaction
+
+        :param edges: edges as dicts with n1, r, n2 and optional t1, t2 and
+        count
+        :type edges: List[Dict]
+        :param node_type: node type used when an edge doesn't have one
+        :type node_type: str
+        :param confidence: confidence of a new relationship, default to 0.5
+        :type confidence: float
+        :param increase_factor: how much an existing relationship is
+        strengthened, same as `Neo4j.calculate_confidence`, default to 0.10
+        :type increase_factor: float
+        :return: List of dict
+        :rtype: List of Dict
+        """
+        results = []
+        stored = []
+        # milliseconds, like timestamp() in Neo4j
+        now = time.time() * 1000
+        with self.lock:
+            for edge in edges:
+                node1 = (edge.get("t1", node_type) or cypher.BASE_LABEL,
+                         edge["n1"])
+                node2 = (edge.get("t2", node_type) or cypher.BASE_LABEL,
+                         edge["n2"])
+                properties = self._add_edge(node1, edge["r"], node2)
+                count = edge.get("count", 1)
+                if "confidence" not in properties:
+                    properties["confidence"] = confidence
+                    count -= 1
+                for _ in range(count):
+                    properties["confidence"] = Neo4j.calculate_confidence(
+                        confidence=properties["confidence"] or 0,
+                        increase_factor=increase_factor)
+                properties["updated"] = now
+                stored.append((node1, edge["r"], node2, properties))
+                results.append({"n1": node1[1],
+                                "r": edge["r"],
+                                "confidence": properties["confidence"],
+                                "n2": node2[1]})
+            self._store_edges(stored)
+
+        return results
+
+    def find_edge(self,
+                  edge: str,
+                  node1_type: str,
+                  node2_type: str,
+                  node1_name: str,
+                  node2_name: str) -> List[Dict[str, str]]:
+        """Find a relationship with two nodes. The relationship is
+        unidirectional.
+
+        :param edge: indicate the relaitonship between two nodes
+        :type edge: str
+        :param node1_type: indicate the type of node 1
+        :type node1_type: str
+        :param node2_type: indicate the type of node 2
+        :type node2_type: str
+        :param node1_name: name of node one
+        :type node1_name: str
+        :param node2_name: name of node two
+        :type node2_name: str
+        :return: List of Dict
+        :rtype: List[Dict[str,str]]
+        """
+        with self.lock:
+            properties = self.outgoing.get(
+                (node1_type or cypher.BASE_LABEL, node1_name), {}).get(
+                (edge, node2_type or cypher.BASE_LABEL, node2_name))
+            if properties is None:
+                return []
+            return [{"n1": node1_name,
+                     "n2": node2_name,
+                     "r": edge,
+                     "confidence": properties["confidence"]}]
+
+    def _nodes(self, node_type: str, node_name: str) -> List[Tuple[str, str]]:
+        """Nodes with a name, of the given type or of any type if None"""
+        types = self.types_by_name.get(node_name, ())
+        if node_type is None:
+            return [(found_type, node_name) for found_type in types]
+        return [(node_type, node_name)] if node_type in types else []
+
+    def find_all_edge(self,
+                      node_type: str,
+                      node_name: str,
+                      limit: int = None,
+                      rel_types: Iterable[str] = None,
+                      min_confidence: float = None) -> List[Dict[str, str]]:
+        """Find all relationships going out of or coming into a node. See
+        `Neo4j.find_all_edge`.
+
+        :param node_type: indicate the type of node, None for any type
+        :type node_type: str
+        :param node_name: name of node
+        :type node_name: str
+        :param limit: return only this many relationships, the most confident
+        ones, None for all of them, defaults to None
+        :type limit: int, optional
+        :param rel_types: only return relationships of these types, None for
+        any type, defaults to None
+        :type rel_types: Iterable[str], optional
+        :param min_confidence: only return relationships with at least this
+        confidence, defaults to None
+        :type min_confidence: float, optional
+        :return: List of Dict
+        :rtype: List[Dict[str,str]]
+        """
+        rel_types = set(rel_types) if rel_types else None
+        results = []
+        with self.lock:
+            for node in self._nodes(node_type, node_name):
+                for (edge, _, other), properties in self.outgoing.get(
+                        node, {}).items():
+                    results.append({"n1": node_name, "r": edge,
+                                    "c": properties["confidence"],
+                                    "n2": other})
+                for (edge, _, other), properties in self.incoming.get(
+                        node, {}).items():
+                    results.append({"n1": other, "r": edge,
+                                    "c": properties["confidence"],
+                                    "n2": node_name})
+
+        results = [row for row in results
+                   if (rel_types is None or row["r"] in rel_types)
+                   and (min_confidence is None
+                        or (row["c"] or 0) >= min_confidence)]
+        if limit is not None:
+            # edges without a confidence, e.g. from a snapshot, count as 0
+            results = sorted(results, key=lambda row: row["c"] or 0,
+                             reverse=True)[:limit]
+        return results
+
+    def recall(self,
+               seeds: Iterable[str],
+               hops: int = 3,
+               decay: float = 0.8,
+               threshold: float = 0.01,
+               top_k: int = 20,
+               node_type: str = None,
+               max_frontier: int = 1000) -> List[Dict]:
+        """Recall the concepts related to the seed concepts by spreading
+        activation from them, see `Neo4j.recall`. Activation is spread one
+        hop at a time, keeping only the best path to every node.
+
+        :param seeds: names of the seed concepts
+        :type seeds: Iterable[str]
+        :param hops: maximum path length, defaults to 3
+        :type hops: int, optional
+        :param decay: how much activation is lost at every hop, defaults to
+        0.8
+        :type decay: float, optional
+        :param threshold: minimum activation of a path, defaults to 0.01
+        :type threshold: float, optional
+        :param top_k: number of concepts returned, defaults to 20
+        :type top_k: int, optional
+        :param node_type: type of the seed nodes, None for any type, defaults
+        to None
+        :type node_type: str, optional
+        :param max_frontier: number of concepts expanded at every hop,
+        defaults to 1000
+        :type max_frontier: int, optional
+        :return: concepts as dicts with name, activation and path, the names
+        from a seed to the concept, most activated first
+        :rtype: List[Dict]
+        """
+        seeds = list(seeds)
+        with self.lock:
+            # node -> (activation, path) of the best path found so far
+            best = {node: (1.0, [node[1]])
+                    for seed in seeds
+                    for node in self._nodes(node_type, seed)}
+            frontier = dict(best)
+            for _ in range(hops):
+                reached = {}
+                for node, (activation, path) in frontier.items():
+                    neighbours = list(self.outgoing.get(node, {}).items()) \
+                        + list(self.incoming.get(node, {}).items())
+                    for (_, *other), properties in neighbours:
+                        other = tuple(other)
+                        spread = activation * decay \
+                            * (properties["confidence"] or 0)
+                        if spread < threshold \
+                                or spread <= best.get(other, (0, None))[0] \
+                                or spread <= reached.get(other, (0, None))[0]:
+                            continue
+                        reached[other] = (spread, path + [other[1]])
+                frontier = dict(heapq.nlargest(
+                    max_frontier, reached.items(),
+                    key=lambda item: item[1][0]))
+                best.update(frontier)
+                if not frontier:
+                    break
+
+        seeds = set(seeds)
+        recalled = [{"name": node_name,
+                     "activation": round(activation, 3),
+                     "path": path}
+                    for (_, node_name), (activation, path) in best.items()
+                    if node_name not in seeds]
+        return sorted(recalled, key=lambda row: row["activation"],
+                      reverse=True)[:top_k]
+
+    def find_node(self,
+                  node_name: str,
+                  node_type: str = None) -> List[str]:
+        """Find the node and indicate whether it's found
+
+        :param node_name: name of node
+        :type node_name: str
+        :param node_type: type of node, None for any type
+        :type node_type: str
+        :return: one name for every node found
+        :rtype: List[str]
+        """
+        return self.find_nodes(node_names=[node_name],
+                               node_type=node_type)
+
+    def find_nodes(self,
+                   node_names: Iterable[str],
+                   node_type: str = None) -> List[str]:
+        """Find many nodes at once
+
+        :param node_names: names of the nodes
+        :type node_names: Iterable[str]
+        :param node_type: type of the nodes, None for any type
+        :type node_type: str
+        :return: one name for every node found
+        :rtype: List[str]
+        """
+        with self.lock:
+            return [node_name for node_name in node_names
+                    for _ in self._nodes(node_type, node_name)]
+
+    def export_snapshot(self,
+                        path: Path,
+                        block_size: int = 65536) -> Dict[str, int]:
+        """Write the graph to a snapshot file, see `Neo4j.export_snapshot`
+
+        :param path: snapshot file
+        :type path: Path
+        :param block_size: rows per block in the file, defaults to 65536
+        :type block_size: int, optional
+        :return: number of nodes and edges written
+        :rtype: Dict[str, int]
+        """
+        with self.lock, SnapshotWriter(path, block_size=block_size) as writer:
+            node_numbers = {}
+            for node_name, types in self.types_by_name.items():
+                for node_type in types:
+                    node_numbers[(node_type, node_name)] = writer.add_node(
+                        name=node_name, label=node_type)
+            for node1, edges in self.outgoing.items():
+                for (edge, *node2), properties in edges.items():
+                    writer.add_edge(node1=node_numbers[node1],
+                                    edge=edge,
+                                    node2=node_numbers[tuple(node2)],
+                                    confidence=properties["confidence"])
+        return {"nodes": writer.node_count, "edges": writer.edge_count}
+
+    def import_snapshot(self,
+                        path: Path,
+                        batch_size: int = 5000) -> Dict[str, int]:
+        """Load a snapshot, see `Neo4j.import_snapshot`
+
+        :param path: snapshot file
+        :type path: Path
+        :param batch_size: rows written per sqlite transaction, defaults to
+        5000
+        :type batch_size: int, optional
+        :return: number of nodes and edges loaded
+        :rtype: Dict[str, int]
+        """
+        counts = {"nodes": 0, "edges": 0}
+        for kind, rows in read_snapshot(path):
+            for batch in utils.batched(rows, batch_size):
+                with self.lock:
+                    if kind == "nodes":
+                        self._restore_nodes(batch)
+                    else:
+                        self._restore_edges(batch)
+                counts[kind] += len(batch)
+        logger.info(f"Imported {counts['nodes']} nodes and "
+                    f"{counts['edges']} edges")
+        return counts
+
+    def _restore_nodes(self, nodes: List[Dict]) -> None:
+        rows = [(node["label"], node["name"]) for node in nodes]
+        for node in rows:
+            self._add_node(*node)
+        if self.conn is not None:
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO nodes VALUES (?, ?)", rows)
+
+    def _restore_edges(self, edges: List[Dict]) -> None:
+        stored = []
+        for edge in edges:
+            node1 = (edge["t1"], edge["n1"])
+            node2 = (edge["t2"], edge["n2"])
+            properties = self._add_edge(node1, edge["r"], node2)
+            properties["confidence"] = edge["confidence"]
+            stored.append((node1, edge["r"], node2, properties))
+        self._store_edges(stored)
+
+    def decay(self,
+              half_life: float = 30 * 24 * 3600,
+              floor: float = 0.05,
+              batch_size: int = 10000) -> Dict[str, int]:
+        """Forget what isn't used, see `Neo4j.decay`. The lock is released
+        between batches so other threads can keep writing.
+
+        :param half_life: seconds for an unused confidence to halve, defaults
+        to 30 days
+        :type half_life: float, optional
+        :param floor: relationships with a lower confidence are deleted,
+        defaults to 0.05
+        :type floor: float, optional
+        :param batch_size: relationships per batch, defaults to 10000
+        :type batch_size: int, optional
+        :return: number of relationships decayed and deleted
+        :rtype: Dict[str, int]
+        """
+        start = time.perf_counter()
+        now = time.time() * 1000
+        counts = {"edges": 0, "deleted": 0}
+        with self.lock:
+            edges = [(node1, edge, (node2_type, node2_name), properties)
+                     for node1, neighbours in self.outgoing.items()
+                     for (edge, node2_type, node2_name), properties
+                     in neighbours.items()]
+
+        for batch in utils.batched(edges, batch_size):
+            decayed = []
+            deleted = []
+            with self.lock:
+                for node1, edge, node2, properties in batch:
+                    # skip edges deleted since the sweep started
+                    if self.outgoing.get(node1, {}).get((edge, *node2)) \
+                            is not properties \
+                            or properties.get("confidence") is None:
+                        continue
+                    updated = properties.get("updated")
+                    since = properties.get("decayed")
+                    if since is None or (updated or 0) > since:
+                        since = updated or now
+                    # a clock behind the one that wrote updated must not
+                    #  make the confidence grow
+                    properties["confidence"] = min(
+                        properties["confidence"]
+                        * 0.5 ** (max(now - since, 0) / (half_life * 1000)),
+                        1.0)
+                    properties["decayed"] = now
+                    if properties["confidence"] < floor:
+                        del self.outgoing[node1][(edge, *node2)]
+                        del self.incoming[node2][(edge, *node1)]
+                        deleted.append((*node1, edge, *node2))
+                    else:
+                        decayed.append((node1, edge, node2, properties))
+
+                self._store_edges(decayed)
+                if self.conn is not None:
+                    with self.conn:
+                        self.conn.executemany(
+                            "DELETE FROM edges WHERE t1 = ? AND n1 = ? "
+                            "AND r = ? AND t2 = ? AND n2 = ?", deleted)
+
+            counts["edges"] += len(decayed) + len(deleted)
+            counts["deleted"] += len(deleted)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Decayed {counts['edges']} relationships, "
+                        f"deleted {counts['deleted']} "
+                        f"({counts['edges'] / elapsed:.0f} edges/s)")
+        return counts
@@ -1,9 +1,14 @@
+import time
 from neo4j import GraphDatabase
 from loguru import logger
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Iterable, Tuple
 from brain.naive import utils
-from neo4j.exceptions import ServiceUnavailable
+from brain.naive import cypher
+from brain.naive.write_buffer import EdgeWriteBuffer
+from brain.naive.snapshot import SnapshotWriter, read_snapshot
+from brain.scrape.cache import Cache
+from neo4j.exceptions import ServiceUnavailable, ClientError
 from enum import Enum
 
 
@@ -12,13 +17,34 @@ class Neo4jEnums(Enum):
     USER = "user"
     PASSWORD = "password"
     NEO4J = "neo4j"
+    BACKEND = "backend"
+    PATH = "path"
 
 
 class Neo4j:
     """This object will be used to manipulate Neo4j graphical database.
+
+    :param buffer_size: queue edge writes in a write-behind buffer that
+    flushes once this many distinct edges are pending, None to write every
+    edge right away, defaults to None
+    :type buffer_size: int, optional
+    :param flush_interval: seconds between flushes of the write buffer,
+    defaults to 1.0
+    :type flush_interval: float, optional
+    :param cache_size: cache up to this many `find_node`, `find_edge` and
+    `find_all_edge` results in memory, None to always query the database,
+    defaults to None
+    :type cache_size: int, optional
+    :param cache_ttl: seconds a cached result stays valid, None to keep it
+    until a write through this object changes it, defaults to None
+    :type cache_ttl: float, optional
     """
 
-    def __init__(self):
+    def __init__(self,
+                 buffer_size: int = None,
+                 flush_interval: float = 1.0,
+                 cache_size: int = None,
+                 cache_ttl: float = None):
         # Load credential from secret file
         credentials = utils.load_credentials(
             secret_file=Path("brain/naive/neo4j.json"))
@@ -29,11 +55,174 @@ class Neo4j:
             auth=(credentials[Neo4jEnums.USER.value],
                   credentials[Neo4jEnums.PASSWORD.value]))
 
+        self.write_buffer = None
+        if buffer_size:
+            self.write_buffer = EdgeWriteBuffer(
+                write=self._write_edges,
+                max_pending=buffer_size,
+                flush_interval=flush_interval)
+
+        # whether every node has the base label, None until it's checked by
+        #  the first lookup without a node type, see _lookup_type
+        self.base_label_ready = None
+
+        self.cache = None
+        if cache_size:
+            self.cache = Cache(size=cache_size,
+                               ttl=cache_ttl,
+                               tags=self._cache_tags)
+
     def close(self):
-        """Close the connections
+        """Flush the buffered writes and close the connections
         """
+        if self.write_buffer is not None:
+            self.write_buffer.close()
         self.driver.close()
 
+    def flush(self) -> int:
+        """Write the buffered edges now
+
+        :return: number of edges written
+        :rtype: int
+        """
+        if self.write_buffer is None:
+            return 0
+        return self.write_buffer.flush()
+
+    def cache_stats(self) -> Dict[str, float]:
+        """Hit and miss counters of the lookup cache
+
+        :return: hits, misses, hit rate, evictions, invalidations and number
+        of cached results, empty if there is no cache
+        :rtype: Dict[str, float]
+        """
+        if self.cache is None:
+            return {}
+        return self.cache.stats
+
+    def _cached(self, key: tuple, lookup) -> List:
+        """Return the cached result of a lookup, or run it and cache it
+
+        :param key: cache key, the kind of lookup followed by its arguments
+        :type key: tuple
+        :param lookup: function running the lookup on the database
+        :type lookup: Callable[[], List]
+        :return: result of the lookup
+        :rtype: List
+        """
+        if self.cache is None:
+            return lookup()
+        result = self.cache.get(key)
+        if result is None:
+            # not cached if a write invalidated anything during the lookup
+            generation = self.cache.generation
+            result = lookup()
+            self.cache.put(key, result, generation=generation)
+        # a copy, so callers can't change what is cached
+        return list(result)
+
+    @staticmethod
+    def _cache_tags(key: Tuple) -> Tuple[str, ...]:
+        """Names of the nodes a cached lookup depends on. Cache keys start
+        with the kind of lookup and the node name, and edge keys have the
+        second node name next.
+
+        :param key: cache key
+        :type key: Tuple
+        :return: node names
+        :rtype: Tuple[str, ...]
+        """
+        return key[1:3] if key[0] == "edge" else key[1:2]
+
+    def _invalidate(self, node_names: Iterable[str]) -> None:
+        """Drop the cached lookups involving any of the nodes after a write,
+        visiting only the entries of those nodes
+
+        :param node_names: names of the nodes written
+        :type node_names: Iterable[str]
+        """
+        if self.cache is None:
+            return
+        self.cache.invalidate_tagged(node_names)
+
+    def ensure_schema(self,
+                      node_types: Iterable[str] = ("unknown",),
+                      batch_size: int = 10000) -> List[str]:
+        """Create the indexes used by the node lookups. It's safe to run many
+        times. Every node type gets a uniqueness constraint on its name (which
+        is also an index), the base label used by lookups without a node type
+        gets an index, and nodes created before the base label existed get it
+        added in batches.
+
+        :param node_types: node types to constrain on top of the ones already
+        in the database, defaults to ("unknown",)
+        :type node_types: Iterable[str], optional
+        :param batch_size: number of nodes labelled per transaction, defaults
+        to 10000
+        :type batch_size: int, optional
+        :return: node types whose name lookups are still not indexed
+        :rtype: List[str]
+        """
+        with self.driver.session(database=Neo4jEnums.NEO4J.value) as session:
+            labels = {row["label"] for row in session.run(cypher.LABELS)}
+            labels.update(node_types)
+            labels.discard(cypher.BASE_LABEL)
+
+            # schema changes run in their own auto-commit transactions
+            for node_type in sorted(labels):
+                try:
+                    session.run(cypher.unique_name(node_type)).consume()
+                except ClientError as exception:
+                    # e.g. duplicate names created before the constraint
+                    logger.warning(f"No uniqueness constraint on "
+                                   f"{node_type}.name: {exception.message}")
+                    session.run(cypher.name_index(node_type)).consume()
+
+            session.run(cypher.name_index(cypher.BASE_LABEL)).consume()
+            session.run(cypher.add_base_label(batch_size)).consume()
+        self.base_label_ready = True
+
+        return self.unindexed_lookups()
+
+    def unindexed_lookups(self) -> List[str]:
+        """Find the node types whose name lookups can't use an index. The
+        base label is among them until `ensure_schema` has indexed it and
+        added it to every node.
+
+        :return: node types without an index on name
+        :rtype: List[str]
+        """
+        with self.driver.session(database=Neo4jEnums.NEO4J.value) as session:
+            labels = {row["label"] for row in session.run(cypher.LABELS)}
+            indexed = {name
+                       for row in session.run(cypher.NAME_INDEXES)
+                       for name in row["labelsOrTypes"] or []}
+
+        labels.add(cypher.BASE_LABEL)
+        unindexed = sorted(labels - indexed)
+        for node_type in unindexed:
+            logger.warning(f"Lookups on {node_type}.name are not indexed")
+        return unindexed
+
+    def _lookup_type(self, node_type: str = None) -> str:
+        """Node type to look nodes up with. Lookups without a node type use
+        the base label, but on a graph where `ensure_schema` hasn't added it
+        to the older nodes yet they match nodes with any labels instead, so
+        they aren't missed. The schema is only checked once.
+
+        :param node_type: type of node, None for any type, defaults to None
+        :type node_type: str, optional
+        :return: the node type, the base label or `cypher.ANY_LABEL`
+        :rtype: str
+        """
+        if node_type is not None:
+            return node_type
+        if self.base_label_ready is None:
+            # the base label is indexed once ensure_schema has run
+            self.base_label_ready = \
+                cypher.BASE_LABEL not in self.unindexed_lookups()
+        return None if self.base_label_ready else cypher.ANY_LABEL
+
     def create_node(self,
                     node_type: str,
                     node_name: str) -> None:
@@ -53,6 +242,7 @@ class Neo4j:
                 node_name)
             for row in result:
                 logger.info(f"Created node {row['n']}")
+        self._invalidate([node_name])
 
     @staticmethod
     def _create_node(tx,
@@ -70,10 +260,7 @@ class Neo4j:
         :rtype: List[Dict]
         """
 
-        query = (
-            f"CREATE (n:{node_type} {{ name: $node_name }}) "
-            f"RETURN n"
-        )
+        query = cypher.create_node(node_type)
         result = tx.run(query,
                         node_name=node_name)
         try:
@@ -89,7 +276,8 @@ class Neo4j:
                     node1_type: str,
                     node2_type: str,
                     node1_name: str,
-                    node2_name: str):
+                    node2_name: str,
+                    upsert: bool = True):
         """Create a relationship with two nodes. The relationship is 
         unidirectional. If the relationship alread exist, then choose to 
         strenthen the relationship. 
@@ -105,7 +293,40 @@ class Neo4j:
         :type node1_name: str
         :param node2_name: name of node two
         :type node2_name: str
+        :param upsert: merge the nodes and the relationship and update the
+        confidence on the server in one atomic statement, instead of finding
+        and then creating or modifying them, defaults to True
+        :type upsert: bool, optional
         """
+        if self.write_buffer is not None:
+            self.write_buffer.add({"n1": node1_name,
+                                   "r": edge,
+                                   "n2": node2_name,
+                                   "t1": node1_type,
+                                   "t2": node2_type})
+            self._invalidate([node1_name, node2_name])
+            return
+
+        if upsert:
+            with self.driver.session(
+                    database=Neo4jEnums.NEO4J.value) as session:
+                # One write transaction, so concurrent writers can't lose
+                #  each other's updates
+                result = session.execute_write(
+                    self._create_edges,
+                    [{"n1": node1_name,
+                      "r": edge,
+                      "n2": node2_name,
+                      "t1": node1_type,
+                      "t2": node2_type}],
+                    node1_type)
+                for row in result:
+                    logger.info(f"Relationship {edge} between {row['n1']} "
+                                f"and {row['n2']} has confidence "
+                                f"{row['confidence']}")
+            self._invalidate([node1_name, node2_name])
+            return
+
         # Create nodes if they don't exist
         if not self.find_node(node_type=node1_type,
                               node_name=node1_name):
@@ -156,6 +377,150 @@ class Neo4j:
                 for row in result:
                     logger.info(f"Relationship {edge} was strenthened "
                                  f"between {node1_name} and {node2_name}")
+        self._invalidate([node1_name, node2_name])
+
+    def create_edges(self,
+                     edges: Iterable[Dict],
+                     node_type: str = "unknown",
+                     batch_size: int = 500) -> int:
+        """Create many relationships at once. Each edge is a dict with n1, n2
+        as node names and r as the relationship, optionally with t1 and t2 as
+        the node types. Every batch is written with one UNWIND/MERGE statement
+        per relationship type, so nodes are created if missing, new
+        relationships start at the default confidence, and existing ones are
+        strengthened the same way as `create_edge`.
+
+        :param edges: edges to write, e.g. the output of
+        `ConceptNet.format_for_neo4j`
+        :type edges: Iterable[Dict]
+        :param node_type: node type used when an edge doesn't give t1 or t2,
+        defaults to "unknown"
+        :type node_type: str, optional
+        :param batch_size: number of edges written per transaction, defaults
+        to 500
+        :type batch_size: int, optional
+        :return: number of edges written, or queued if writes are buffered
+        :rtype: int
+        """
+        if self.write_buffer is not None:
+            total = 0
+            node_names = set()
+            for edge in edges:
+                self.write_buffer.add(dict(edge,
+                                           t1=edge.get("t1", node_type),
+                                           t2=edge.get("t2", node_type)))
+                node_names.update((edge["n1"], edge["n2"]))
+                total += 1
+            self._invalidate(node_names)
+            return total
+
+        return self._write_edges(edges=edges,
+                                 node_type=node_type,
+                                 batch_size=batch_size)
+
+    def _write_edges(self,
+                     edges: Iterable[Dict],
+                     node_type: str = "unknown",
+                     batch_size: int = 500) -> int:
+        """Write edges to the database right away, see `create_edges`
+
+        :param edges: edges as dicts with n1, r, n2 and optional t1, t2 and
+        count
+        :type edges: Iterable[Dict]
+        :param node_type: node type used when an edge doesn't give t1 or t2,
+        defaults to "unknown"
+        :type node_type: str, optional
+        :param batch_size: number of edges written per transaction, defaults
+        to 500
+        :type batch_size: int, optional
+        :return: number of edges written
+        :rtype: int
+        """
+        total = 0
+        with self.driver.session(database=Neo4jEnums.NEO4J.value) as session:
+            for batch in utils.batched(edges, batch_size):
+                # Write transactions allow the driver to handle retries and
+                #  transient errors
+                result = session.execute_write(
+                    self._create_edges,
+                    batch,
+                    node_type)
+                total += len(result)
+                logger.info(f"Created or strengthened {len(result)} "
+                            f"relationships ({total} so far)")
+                self._invalidate([name for edge in batch
+                                  for name in (edge["n1"], edge["n2"])])
+        return total
+
+    @staticmethod
+    def _create_edges(tx,
+                      edges: List[Dict],
+                      node_type: str,
+                      confidence: float = 0.5,
+                      increase_factor: float = 0.10) -> List[Dict]:
+        """Actually create the relationships in a transaction function. Labels
+        and relationship types can't be query parameters, so the edges are
+        grouped by them and each group is sent as a single UNWIND statement.
+
+        :param tx: the transaction function
+        :type tx: unknown, probably a Callable
+        :param edges: edges as dicts with n1, r, n2 and optional t1, t2
+        :type edges: List[Dict]
+        :param node_type: node type used when an edge doesn't have one
+        :type node_type: str
+        :param confidence: confidence of a new relationship, default to 0.5
+        :type confidence: float
+        :param increase_factor: how much an existing relationship is
+        strengthened, same as `calculate_confidence`, default to 0.10
+        :type increase_factor: float
+        :return: List of dict
+        :rtype: List of Dict
+        """
+        all_results = []
+        groups = Neo4j.group_edges(edges=edges,
+                                   node_type=node_type)
+        for (node1_type, node2_type, edge), rows in groups.items():
+            query = cypher.create_edges(node1_type, node2_type, edge)
+            result = tx.run(query,
+                            rows=rows,
+                            confidence=confidence,
+                            increase_factor=increase_factor)
+            try:
+                all_results.extend([{"n1": row["n1"]["name"],
+                                     "r": edge,
+                                     "confidence": row["r"]["confidence"],
+                                     "n2": row["n2"]["name"]}
+                                    for row in result])
+            # Capture any errors along with the query and data for
+            #  traceability
+            except ServiceUnavailable as exception:
+                logger.error(f"{query} raised an error: \n {exception}")
+                raise
+        return all_results
+
+    @staticmethod
+    def group_edges(edges: Iterable[Dict],
+                    node_type: str) -> Dict[tuple, List[Dict]]:
+        """Group edges by node types and relationship, because labels and
+        relationship types can't be query parameters
+
+        :param edges: edges as dicts with n1, r, n2 and optional t1, t2 and
+        count, the number of times the edge is reinforced
+        :type edges: Iterable[Dict]
+        :param node_type: node type used when an edge doesn't have one
+        :type node_type: str
+        :return: rows of n1, n2 names and count keyed by (t1, t2, r)
+        :rtype: Dict[tuple, List[Dict]]
+        """
+        groups = {}
+        for edge in edges:
+            key = (edge.get("t1", node_type),
+                   edge.get("t2", node_type),
+                   edge["r"])
+            groups.setdefault(key, []).append({"n1": edge["n1"],
+                                               "n2": edge["n2"],
+                                               "count": edge.get("count", 1)})
+        return groups
 
     @staticmethod
     def _create_and_return_edge(tx,
@@ -190,15 +555,11 @@ class Neo4j:
         # The Reference Card is also a good resource for keywords
         #  https://neo4j.com/docs/cypher-refcard/current/
 
-        query = (
-            f"MATCH (n1: {node1_type}), (n2: {node2_type}) "
-            f"WHERE n1.name = '{node1_name}' AND n2.name = '{node2_name}' "
-            f"CREATE (n1)-[r: {edge} "
-            f"{{ confidence: {confidence} }}]->(n2) "
-            f"RETURN n1, n2"
-        )
-
-        result = tx.run(query)
+        query = cypher.create_edge(node1_type, node2_type, edge)
+        result = tx.run(query,
+                        node1_name=node1_name,
+                        node2_name=node2_name,
+                        confidence=confidence)
         try:
             return [{"n1": row["n1"]["name"], "n2": row["n2"]["name"]}
                     for row in result]
@@ -252,15 +613,11 @@ class Neo4j:
         :return: List of dict 
         :rtype: List of Dict
         """
-        query = (
-            f"MATCH (n1: {node1_type} {{ name: '{node1_name}' }}) "
-            f"-[r:{edge}]->"
-            f"(n2: {node2_type} {{ name: '{node2_name}'}}) "
-            f"SET r.confidence = {confidence} "
-            f"RETURN n1, n2"
-        )
-
-        result = tx.run(query)
+        query = cypher.modify_edge(node1_type, node2_type, edge)
+        result = tx.run(query,
+                        node1_name=node1_name,
+                        node2_name=node2_name,
+                        confidence=confidence)
         try:
             return [{"n1": row["n1"]["name"], "n2": row["n2"]["name"]}
                     for row in result]
@@ -292,22 +649,28 @@ class Neo4j:
         :return: List of Dict
         :rtype: List[Dict[str,str]]
         """
-        with self.driver.session(database=Neo4jEnums.NEO4J.value) as session:
-            # Write transactions allow the driver to handle retries and
-            #  transient errors
-            result = session.execute_write(
-                self._find_edge,
-                edge,
-                node1_type,
-                node2_type,
-                node1_name,
-                node2_name)
-            for row in result:
-                logger.info(f"Found relationship({edge}) between: "
-                             f"{row['n1']}, {row['n2']}")
+        def lookup():
+            with self.driver.session(
+                    database=Neo4jEnums.NEO4J.value) as session:
+                # Write transactions allow the driver to handle retries and
+                #  transient errors
+                result = session.execute_write(
+                    self._find_edge,
+                    edge,
+                    node1_type,
+                    node2_type,
+                    node1_name,
+                    node2_name)
+                for row in result:
+                    logger.info(f"Found relationship({edge}) between: "
+                                f"{row['n1']}, {row['n2']}")
 
-            # return relationships if found any
-            return [row for row in result]
+                # return relationships if found any
+                return [row for row in result]
+
+        return self._cached(("edge", node1_name, node2_name,
+                             edge, node1_type, node2_type),
+                            lookup)
 
     @staticmethod
     def _find_edge(tx,
@@ -339,12 +702,10 @@ class Neo4j:
         # The Reference Card is also a good resource for keywords
         #  https://neo4j.com/docs/cypher-refcard/current/
 
-        query = (
-            f"MATCH (n1: {node1_type})-[r:{edge}]->(n2:{node2_type}) "
-            f"WHERE n1.name = '{node1_name}' AND n2.name = '{node2_name}' "
-            f"RETURN n1, n2, r"
-        )
-        result = tx.run(query)
+        query = cypher.find_edge(node1_type, node2_type, edge)
+        result = tx.run(query,
+                        node1_name=node1_name,
+                        node2_name=node2_name)
         try:
             return [{"n1": row["n1"]["name"],
                      "n2": row["n2"]["name"],
@@ -358,36 +719,62 @@ class Neo4j:
 
     def find_all_edge(self,
                       node_type: str,
-                      node_name: str) -> List[Dict[str, str]]:
-        """Find all relationships with originated from the starting node. The 
-        relationship is unidirectional.
+                      node_name: str,
+                      limit: int = None,
+                      rel_types: Iterable[str] = None,
+                      min_confidence: float = None) -> List[Dict[str, str]]:
+        """Find all relationships going out of or coming into a node. This
+        only reads, so it can be routed to a follower or read replica.
 
-        :param node_type: indicate the type of node 1
+        :param node_type: indicate the type of node, None for any type
         :type node_type: str
-        :param node_name: name of node one
+        :param node_name: name of node
         :type node_name: str
+        :param limit: return only this many relationships, the most confident
+        ones, None for all of them, defaults to None
+        :type limit: int, optional
+        :param rel_types: only return relationships of these types, None for
+        any type, defaults to None
+        :type rel_types: Iterable[str], optional
+        :param min_confidence: only return relationships with at least this
+        confidence, defaults to None
+        :type min_confidence: float, optional
         :return: List of Dict
         :rtype: List[Dict[str,str]]
         """
-        with self.driver.session(database=Neo4jEnums.NEO4J.value) as session:
-            # Write transactions allow the driver to handle retries and
-            #  transient errors
-            result = session.execute_write(
-                self._find_all_edge,
-                node_type,
-                node_name)
-            for row in result:
-                logger.info(f"Found relationship({row['r']}) between: "
-                             f"{row['n1']}, {row['n2']}")
+        rel_types = tuple(sorted(rel_types)) if rel_types else ()
+
+        def lookup():
+            with self.driver.session(
+                    database=Neo4jEnums.NEO4J.value) as session:
+                # Read transactions allow the driver to handle retries and
+                #  transient errors, and to use any member of the cluster
+                result = session.execute_read(
+                    self._find_all_edge,
+                    self._lookup_type(node_type),
+                    node_name,
+                    limit,
+                    rel_types,
+                    min_confidence)
+                for row in result:
+                    logger.info(f"Found relationship({row['r']}) between: "
+                                f"{row['n1']}, {row['n2']}")
+
+                # return relationships if found any
+                return [row for row in result]
 
-            # return relationships if found any
-            return [row for row in result]
+        return self._cached(("all", node_name, node_type,
+                             limit, rel_types, min_confidence),
+                            lookup)
 
     @staticmethod
     def _find_all_edge(tx,
                        node_type: str,
-                       node_name: str) -> List[Dict]:
-        """Actually find the relationship in a transaction function 
+                       node_name: str,
+                       limit: int = None,
+                       rel_types: tuple = (),
+                       min_confidence: float = None) -> List[Dict]:
+        """Actually find the relationships in a transaction function
 
         :param tx: the transaction function
         :type tx: unknown, probably a Callable
@@ -395,51 +782,113 @@ class Neo4j:
         :type node_type: str
         :param node_name: name for node
         :type node_name: str
-        :return: List of dict 
+        :param limit: maximum number of relationships, defaults to None
+        :type limit: int, optional
+        :param rel_types: relationship types to keep, defaults to ()
+        :type rel_types: tuple, optional
+        :param min_confidence: minimum confidence, defaults to None
+        :type min_confidence: float, optional
+        :return: List of dict
         :rtype: List of Dict
         """
-        if node_type:
-            # get all relationships originated to the node
-            query = (
-                f"MATCH(n1: {node_type} {{name: '{node_name}'}})-[r]->(n2) "
-                f"RETURN n1, r, n2"
-            )
-            result1 = tx.run(query)
-
-            # get all relationships directed towards the node
-            query = (
-                f"MATCH(n1)-[r]->(n2:{node_type} {{name: '{node_name}'}}) "
-                f"RETURN n1, r, n2"
-            )
-        else:
-            # get all relationships originated to the node
-            query = (
-                f"MATCH(n1 {{name: '{node_name}'}})-[r]->(n2) "
-                f"RETURN n1, r, n2"
-            )
-            result1 = tx.run(query)
+        # get all relationships originated from and directed towards the
+        #  node with one undirected pattern
+        query = cypher.neighbourhood(node_type,
+                                     rel_types,
+                                     min_confidence is not None,
+                                     limit is not None)
+        result = tx.run(query,
+                        node_name=node_name,
+                        limit=limit,
+                        min_confidence=min_confidence)
+        try:
+            return [{"n1": row["n1"]["name"],
+                     "r": str(row['r'].type),
+                     "c": row['r']['confidence'],
+                     "n2": row["n2"]["name"]}
+                    for row in result]
+        # Capture any errors along with the query and data for traceability
+        except ServiceUnavailable as exception:
+            logger.error(f"{query} raised an error: \n {exception}")
+            raise
+
+    def recall(self,
+               seeds: Iterable[str],
+               hops: int = 3,
+               decay: float = 0.8,
+               threshold: float = 0.01,
+               top_k: int = 20,
+               node_type: str = None,
+               max_frontier: int = 1000) -> List[Dict]:
+        """Recall the concepts related to the seed concepts by spreading
+        activation from them. Each relationship passes on its confidence times
+        decay, so a concept reached through a path is activated by the product
+        along the path. Activation spreads one hop at a time for up to hops
+        relationships in either direction, keeping the best path to every
+        concept and pruning paths once their activation is below the
+        threshold, and only the max_frontier most activated concepts of a hop
+        are expanded further. The traversal runs on the server in one read
+        transaction.
 
-            # get all relationships directed towards the node
-            query = (
-                f"MATCH(n1)-[r]->(n2 {{name: '{node_name}'}}) "
-                f"RETURN n1, r, n2"
-            )
+        :param seeds: names of the seed concepts
+        :type seeds: Iterable[str]
+        :param hops: maximum path length, defaults to 3
+        :type hops: int, optional
+        :param decay: how much activation is lost at every hop, defaults to
+        0.8
+        :type decay: float, optional
+        :param threshold: minimum activation of a path, defaults to 0.01
+        :type threshold: float, optional
+        :param top_k: number of concepts returned, defaults to 20
+        :type top_k: int, optional
+        :param node_type: type of the seed nodes, None for any type, defaults
+        to None
+        :type node_type: str, optional
+        :param max_frontier: number of concepts expanded at every hop,
+        defaults to 1000
+        :type max_frontier: int, optional
+        :return: concepts as dicts with name, activation and path, the names
+        from a seed to the concept, most activated first
+        :rtype: List[Dict]
+        """
+        with self.driver.session(database=Neo4jEnums.NEO4J.value) as session:
+            return session.execute_read(self._recall,
+                                        list(seeds),
+                                        hops,
+                                        decay,
+                                        threshold,
+                                        top_k,
+                                        self._lookup_type(node_type),
+                                        max_frontier)
 
-        result2 = tx.run(query)
+    @staticmethod
+    def _recall(tx,
+                seeds: List[str],
+                hops: int,
+                decay: float,
+                threshold: float,
+                top_k: int,
+                node_type: str,
+                max_frontier: int) -> List[Dict]:
+        """Spread activation in a transaction function, see `recall`
 
+        :param tx: the transaction function
+        :type tx: unknown, probably a Callable
+        :return: List of dict
+        :rtype: List of Dict
+        """
+        query = cypher.recall(node_type, hops)
+        result = tx.run(query,
+                        seeds=seeds,
+                        decay=decay,
+                        threshold=threshold,
+                        top_k=top_k,
+                        max_frontier=max_frontier)
         try:
-            result1_list = [{"n1": row["n1"]["name"],
-                             "r": str(row['r'].type),
-                             "c": row['r']['confidence'],
-                             "n2": row["n2"]["name"]}
-                            for row in result1]
-            result2_list = [{"n1": row["n1"]["name"],
-                             "r": str(row['r'].type),
-                             "c": row['r']['confidence'],
-                             "n2": row["n2"]["name"]}
-                            for row in result2]
-            all_results = result1_list + result2_list
-            return all_results
+            return [{"name": row["name"],
+                     "activation": round(row["activation"], 3),
+                     "path": row["path"]}
+                    for row in result]
         # Capture any errors along with the query and data for traceability
         except ServiceUnavailable as exception:
             logger.error(f"{query} raised an error: \n {exception}")
@@ -457,15 +906,19 @@ class Neo4j:
         :return: whether there is a node with the given type and name
         :rtype: List[str]
         """
-        with self.driver.session(database=Neo4jEnums.NEO4J.value) as session:
-            result = session.execute_read(
-                self._find_and_return_node,
-                node_type,
-                node_name)
-            for row in result:
-                logger.info(f"Found node: {row}")
-            # return node if found any
-            return [row for row in result]
+        def lookup():
+            with self.driver.session(
+                    database=Neo4jEnums.NEO4J.value) as session:
+                result = session.execute_read(
+                    self._find_and_return_node,
+                    self._lookup_type(node_type),
+                    node_name)
+                for row in result:
+                    logger.info(f"Found node: {row}")
+                # return node if found any
+                return [row for row in result]
+
+        return self._cached(("node", node_name, node_type), lookup)
 
     @staticmethod
     def _find_and_return_node(tx,
@@ -482,18 +935,7 @@ class Neo4j:
         :return: List of str
         :rtype: List of str
         """
-        if node_type:
-            query = (
-                f"MATCH (p:{node_type}) "
-                f"WHERE p.name = $node_name "
-                f"RETURN p.name AS name"
-            )
-        else:
-            query = (
-                f"MATCH (p) "
-                f"WHERE p.name = $node_name "
-                f"RETURN p.name AS name"
-            )
+        query = cypher.find_node(node_type)
         result = tx.run(query,
                         node_name=node_name)
         try:
@@ -502,6 +944,190 @@ class Neo4j:
             logger.error(f"{query} raised an error: \n {exception}")
             raise
 
+    def decay(self,
+              half_life: float = 30 * 24 * 3600,
+              floor: float = 0.05,
+              batch_size: int = 10000) -> Dict[str, int]:
+        """Forget what isn't used. The confidence of every relationship is
+        halved for every half_life seconds since it was last strengthened (or
+        decayed), and relationships that fall below the floor are deleted.
+        The sweep commits every batch_size relationships, so it never holds a
+        large transaction or blocks writers for long.
+
+        :param half_life: seconds for an unused confidence to halve, defaults
+        to 30 days
+        :type half_life: float, optional
+        :param floor: relationships with a lower confidence are deleted,
+        defaults to 0.05
+        :type floor: float, optional
+        :param batch_size: relationships per transaction, defaults to 10000
+        :type batch_size: int, optional
+        :return: number of relationships decayed and deleted
+        :rtype: Dict[str, int]
+        """
+        # write the buffered edges first so they count as strengthened
+        self.flush()
+        start = time.perf_counter()
+        counts = {"edges": 0, "deleted": 0}
+        with self.driver.session(database=Neo4jEnums.NEO4J.value) as session:
+            # CALL IN TRANSACTIONS only works in an auto-commit transaction
+            result = session.run(cypher.decay_edges(batch_size),
+                                 half_life=half_life * 1000,
+                                 floor=floor)
+            for row in result:
+                counts["edges"] += 1
+                counts["deleted"] += row["deleted"]
+                if counts["edges"] % batch_size == 0:
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"Decayed {counts['edges']} relationships, "
+                                f"deleted {counts['deleted']} "
+                                f"({counts['edges'] / elapsed:.0f} edges/s)")
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Decayed {counts['edges']} relationships and deleted "
+                    f"{counts['deleted']} in {elapsed:.1f}s")
+        if self.cache is not None:
+            self.cache.clear()
+        return counts
+
+    def export_snapshot(self,
+                        path: Path,
+                        block_size: int = 65536) -> Dict[str, int]:
+        """Write every node and relationship to a snapshot file, see
+        `brain.naive.snapshot`. Results are streamed from the database into
+        the file, so only the node ids are kept in memory.
+
+        :param path: snapshot file
+        :type path: Path
+        :param block_size: rows per block in the file, defaults to 65536
+        :type block_size: int, optional
+        :return: number of nodes and edges written
+        :rtype: Dict[str, int]
+        """
+        # write the buffered edges first so they are part of the snapshot
+        self.flush()
+        start = time.perf_counter()
+        node_numbers = {}
+        with self.driver.session(database=Neo4jEnums.NEO4J.value) as session,\
+                SnapshotWriter(path, block_size=block_size) as writer:
+            for row in session.run(cypher.ALL_NODES):
+                labels = [node_label for node_label in row["labels"]
+                          if node_label != cypher.BASE_LABEL]
+                node_numbers[row["id"]] = writer.add_node(
+                    name=row["name"],
+                    label=labels[0] if labels else cypher.BASE_LABEL)
+
+            for row in session.run(cypher.ALL_EDGES):
+                node1 = node_numbers.get(row["n1"])
+                node2 = node_numbers.get(row["n2"])
+                # skip edges of nodes created after the nodes were read
+                if node1 is None or node2 is None:
+                    continue
+                writer.add_edge(node1=node1,
+                                edge=row["r"],
+                                node2=node2,
+                                confidence=row["confidence"])
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Exported {writer.node_count} nodes and "
+                    f"{writer.edge_count} edges to {path} "
+                    f"in {elapsed:.1f}s")
+        return {"nodes": writer.node_count, "edges": writer.edge_count}
+
+    def import_snapshot(self,
+                        path: Path,
+                        batch_size: int = 5000) -> Dict[str, int]:
+        """Load a snapshot written by `export_snapshot`. Nodes are merged by
+        type and name, and relationships are created or overwritten with the
+        confidence they had in the snapshot.
+
+        :param path: snapshot file
+        :type path: Path
+        :param batch_size: rows written per transaction, defaults to 5000
+        :type batch_size: int, optional
+        :return: number of nodes and edges loaded
+        :rtype: Dict[str, int]
+        """
+        start = time.perf_counter()
+        counts = {"nodes": 0, "edges": 0}
+        with self.driver.session(database=Neo4jEnums.NEO4J.value) as session:
+            for kind, rows in read_snapshot(path):
+                work = self._restore_nodes if kind == "nodes" \
+                    else self._restore_edges
+                for batch in utils.batched(rows, batch_size):
+                    # Write transactions allow the driver to handle retries
+                    #  and transient errors
+                    counts[kind] += session.execute_write(work, batch)
+                elapsed = time.perf_counter() - start
+                logger.info(f"Imported {counts['nodes']} nodes and "
+                            f"{counts['edges']} edges "
+                            f"({counts['edges'] / elapsed:.0f} edges/s)")
+
+        if self.cache is not None:
+            self.cache.clear()
+        return counts
+
+    @staticmethod
+    def _restore_nodes(tx, nodes: List[Dict]) -> int:
+        """Merge nodes of a snapshot in a transaction function
+
+        :param tx: the transaction function
+        :type tx: unknown, probably a Callable
+        :param nodes: nodes as dicts with name and label
+        :type nodes: List[Dict]
+        :return: number of nodes merged
+        :rtype: int
+        """
+        names_by_label = {}
+        for node in nodes:
+            names_by_label.setdefault(node["label"], []).append(node["name"])
+
+        count = 0
+        for node_type, names in names_by_label.items():
+            query = cypher.merge_nodes(node_type)
+            result = tx.run(query, names=names)
+            try:
+                count += result.single()["count"]
+            # Capture any errors along with the query and data for
+            #  traceability
+            except ServiceUnavailable as exception:
+                logger.error(f"{query} raised an error: \n {exception}")
+                raise
+        return count
+
+    @staticmethod
+    def _restore_edges(tx, edges: List[Dict]) -> int:
+        """Create or overwrite relationships of a snapshot in a transaction
+        function
+
+        :param tx: the transaction function
+        :type tx: unknown, probably a Callable
+        :param edges: edges as dicts with n1, t1, r, n2, t2 and confidence
+        :type edges: List[Dict]
+        :return: number of relationships written
+        :rtype: int
+        """
+        groups = {}
+        for edge in edges:
+            key = (edge["t1"], edge["t2"], edge["r"])
+            groups.setdefault(key, []).append(
+                {"n1": edge["n1"],
+                 "n2": edge["n2"],
+                 "confidence": edge["confidence"]})
+
+        count = 0
+        for (node1_type, node2_type, edge), rows in groups.items():
+            query = cypher.restore_edges(node1_type, node2_type, edge)
+            result = tx.run(query, rows=rows)
+            try:
+                count += result.single()["count"]
+            # Capture any errors along with the query and data for
+            #  traceability
+            except ServiceUnavailable as exception:
+                logger.error(f"{query} raised an error: \n {exception}")
+                raise
+        return count
+
 
 def main():
     # Aura queries use an encrypted connection using the "neo4j+s" URI scheme
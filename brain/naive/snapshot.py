@@ -0,0 +1,235 @@
+""" Compact binary snapshots of the knowledge graph.
+
+A snapshot is a gzip file holding a header and a sequence of blocks. Every
+block starts with its kind and row count, followed by its columns stored as
+little-endian arrays:
+
+- S: new strings, as an array of utf-8 lengths and then the bytes. Names,
+  labels and relationship types are all interned in one string table, so each
+  distinct string is only stored once.
+- N: nodes, as string table indices of the name and the label. Nodes are
+  numbered in the order they appear in the file.
+- E: edges, as node numbers of both ends, string table index of the
+  relationship type, and confidence as a double (NaN if there is none).
+
+Strings are always written before the first block that uses them, so a
+snapshot can be written and read in a single pass.
+"""
+import gzip
+import math
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+MAGIC = b"BRAINSNP"
+VERSION = 1
+
+HEADER = struct.Struct("<8sH")
+BLOCK = struct.Struct("<cI")
+
+STRINGS = b"S"
+NODES = b"N"
+EDGES = b"E"
+
+# array has no fixed size unsigned int type, so find the 4 byte one
+UINT32 = next(code for code in "IL" if array(code).itemsize == 4)
+
+
+def _write_array(file, values: array) -> None:
+    """Write an array in little-endian byte order"""
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    file.write(values.tobytes())
+
+
+def _read_array(file, typecode: str, count: int) -> array:
+    """Read count values of an array written by `_write_array`"""
+    values = array(typecode)
+    size = values.itemsize * count
+    data = file.read(size)
+    if len(data) != size:
+        raise ValueError("Snapshot is truncated")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class SnapshotWriter:
+    """Write a snapshot one node and edge at a time. Rows are buffered in
+    columns and written as a block every block_size rows.
+
+    :param path: snapshot file
+    :type path: Path
+    :param block_size: rows per block, defaults to 65536
+    :type block_size: int, optional
+    """
+
+    def __init__(self,
+                 path: Path,
+                 block_size: int = 65536):
+        self.file = gzip.open(str(path), "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.block_size = block_size
+
+        self.strings = {}
+        self.new_strings = []
+        self.node_count = 0
+        self.edge_count = 0
+        self.nodes = (array(UINT32), array(UINT32))
+        self.edges = (array(UINT32), array(UINT32), array(UINT32),
+                      array("d"))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _intern(self, value: str) -> int:
+        """Index of a string in the string table, adding it if it's new"""
+        index = self.strings.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings[value] = index
+            self.new_strings.append(value)
+        return index
+
+    def add_node(self, name: str, label: str) -> int:
+        """Add a node
+
+        :param name: name of the node
+        :type name: str
+        :param label: node type
+        :type label: str
+        :return: number of the node, used to add its edges
+        :rtype: int
+        """
+        names, labels = self.nodes
+        names.append(self._intern(name))
+        labels.append(self._intern(label))
+        if len(names) >= self.block_size:
+            self._flush_nodes()
+        self.node_count += 1
+        return self.node_count - 1
+
+    def add_edge(self,
+                 node1: int,
+                 edge: str,
+                 node2: int,
+                 confidence: float = None) -> None:
+        """Add an edge between two nodes added before
+
+        :param node1: number of the start node
+        :type node1: int
+        :param edge: relationship type
+        :type edge: str
+        :param node2: number of the end node
+        :type node2: int
+        :param confidence: confidence of the relationship, defaults to None
+        :type confidence: float, optional
+        """
+        # nodes have to be in the file before the edges using them
+        self._flush_nodes()
+        starts, ends, types, confidences = self.edges
+        starts.append(node1)
+        ends.append(node2)
+        types.append(self._intern(edge))
+        confidences.append(math.nan if confidence is None else confidence)
+        if len(starts) >= self.block_size:
+            self._flush_edges()
+        self.edge_count += 1
+
+    def _flush_strings(self) -> None:
+        if not self.new_strings:
+            return
+        encoded = [value.encode("utf-8") for value in self.new_strings]
+        self.file.write(BLOCK.pack(STRINGS, len(encoded)))
+        _write_array(self.file, array(UINT32, map(len, encoded)))
+        self.file.write(b"".join(encoded))
+        self.new_strings = []
+
+    def _flush_columns(self, kind: bytes, columns: Tuple[array, ...]) -> None:
+        if not columns[0]:
+            return
+        self._flush_strings()
+        self.file.write(BLOCK.pack(kind, len(columns[0])))
+        for column in columns:
+            _write_array(self.file, column)
+            del column[:]
+
+    def _flush_nodes(self) -> None:
+        self._flush_columns(NODES, self.nodes)
+
+    def _flush_edges(self) -> None:
+        self._flush_columns(EDGES, self.edges)
+
+    def close(self) -> None:
+        """Write the buffered rows and close the file
+        """
+        self._flush_nodes()
+        self._flush_edges()
+        self.file.close()
+
+
+def read_snapshot(path: Path) -> Iterator[Tuple[str, List[Dict]]]:
+    """Read a snapshot block by block
+
+    :param path: snapshot file
+    :type path: Path
+    :yield: ("nodes", rows with name and label) or ("edges", rows with n1, t1,
+    r, n2, t2 and confidence, the format taken by `Neo4j.create_edges`)
+    :rtype: Iterator[Tuple[str, List[Dict]]]
+    """
+    with gzip.open(str(path), "rb") as file:
+        magic, version = HEADER.unpack(file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} snapshot")
+
+        strings = []
+        node_names = array(UINT32)
+        node_labels = array(UINT32)
+        while True:
+            data = file.read(BLOCK.size)
+            if not data:
+                break
+            kind, count = BLOCK.unpack(data)
+
+            if kind == STRINGS:
+                lengths = _read_array(file, UINT32, count)
+                blob = file.read(sum(lengths))
+                start = 0
+                for length in lengths:
+                    strings.append(blob[start:start + length].decode("utf-8"))
+                    start += length
+
+            elif kind == NODES:
+                names = _read_array(file, UINT32, count)
+                labels = _read_array(file, UINT32, count)
+                node_names.extend(names)
+                node_labels.extend(labels)
+                yield "nodes", [{"name": strings[name],
+                                 "label": strings[label]}
+                                for name, label in zip(names, labels)]
+
+            elif kind == EDGES:
+                starts = _read_array(file, UINT32, count)
+                ends = _read_array(file, UINT32, count)
+                types = _read_array(file, UINT32, count)
+                confidences = _read_array(file, "d", count)
+                yield "edges", [
+                    {"n1": strings[node_names[start]],
+                     "t1": strings[node_labels[start]],
+                     "r": strings[edge],
+                     "n2": strings[node_names[end]],
+                     "t2": strings[node_labels[end]],
+                     "confidence": None if math.isnan(confidence)
+                     else confidence}
+                    for start, end, edge, confidence
+                    in zip(starts, ends, types, confidences)]
+
+            else:
+                raise ValueError(f"Unknown block {kind!r} in {path}")
@@ -1,4 +1,4 @@
-from brain.naive.neo4j_db import Neo4j
+from brain.naive.graph import open_graph
 from loguru import logger
 from brain.naive import utils
 
@@ -6,7 +6,7 @@ from brain.naive import utils
 def test():
     """This is used to display relationships between nodes. 
     """
-    app = Neo4j()
+    app = open_graph(cache_size=1000)
     while True:
         response = input("Use this format to find all relationships "
                          "('exit' to quit): \n"
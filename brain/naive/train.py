@@ -1,23 +1,36 @@
-from brain.naive.neo4j_db import Neo4j
+from brain.naive.graph import open_graph
 from brain.concept_net.concept_net import ConceptNet
+from brain.concept_net.cache import ResponseCache
 from typing import List, Dict
 from loguru import logger
 
 
-def add_concept_net_edges(nodes: List[str]):
+def add_concept_net_edges(nodes: List[str],
+                          cache: ResponseCache = None):
     """Add relationships got from concept net into Neo4j database
 
     :param nodes: the nodes used for searching for edges in concept net
     :type nodes: List[str]
+    :param cache: cache for concept net responses, defaults to opening the
+    on-disk cache in the cache directory for this call only
+    :type cache: ResponseCache, optional
     """
+    own_cache = cache is None
+    if own_cache:
+        cache = ResponseCache()
 
-    # get all relationship for both nodes from concept net
+    # get all relationship for the nodes from concept net concurrently
     concept_net_edges = []
-    for node in nodes:
+    try:
+        payloads = ConceptNet.get_many(concepts=nodes,
+                                       cache=cache)
+    finally:
+        if own_cache:
+            cache.close()
+    for node, related in payloads.items():
         concept = ConceptNet(concept_name=node)
-        related = concept.get_concepts()
-        nodes = concept.format_for_neo4j(conceptnet_output=related)
-        concept_net_edges.extend(nodes)
+        edges = concept.format_for_neo4j(conceptnet_output=related)
+        concept_net_edges.extend(edges)
 
     # put all the relationships together as a string to display
     edges_dicts = [f"({i}): {x['n1']} {x['r']} {x['n2']}"
@@ -70,21 +83,15 @@ def add_edges(edges: Dict,
     the node, defaults to "unknown"
     :type node_type: str, optional
     """
-    for edge in edges:
-        node1_name = edge["n1"]
-        node2_name = edge['n2']
-        edge = edge['r']
-
-        app.create_edge(edge=edge,
-                        node1_type=node_type,
-                        node2_type=node_type,
-                        node1_name=node1_name,
-                        node2_name=node2_name)
+    app.create_edges(edges=edges,
+                     node_type=node_type)
 
 
 def train():
     """This is used to modify relationships between nodes. 
     """
+    # one cache, so every question doesn't open another sqlite connection
+    cache = ResponseCache()
 
     while True:
         response = input("Please indicate relationship in the format "
@@ -104,9 +111,11 @@ def train():
                         node2_name=node2_name)
 
         # add concept net edges
-        add_concept_net_edges(nodes=[node1_name, node2_name])
+        add_concept_net_edges(nodes=[node1_name, node2_name],
+                              cache=cache)
 
     # properly close the session
+    cache.close()
     app.close()
 
 
@@ -116,5 +125,5 @@ def main():
 
 if __name__ == "__main__":
     logger.add("training.log")
-    app = Neo4j()
+    app = open_graph(buffer_size=1000)
     main()
@@ -1,10 +1,11 @@
 from rich.table import Table
 from rich.console import Console
 import argparse
-from typing import List
+from typing import List, Iterable, Iterator
 from pathlib import Path
 from typing import Dict
 import json
+from itertools import islice
 
 
 def load_credentials(secret_file: Path = "neo4j.json") -> Dict:
@@ -52,3 +53,22 @@ def display_edge(edges: List[Dict]):
                     for row in edges]
 
     display_table(rows=node_2d_list)
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[List]:
+    """Split an iterable into lists of at most batch_size items without
+    reading the whole iterable into memory
+
+    :param items: items to split into batches
+    :type items: Iterable
+    :param batch_size: maximum number of items in a batch
+    :type batch_size: int
+    :yield: list of items
+    :rtype: Iterator[List]
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
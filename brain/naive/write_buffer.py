@@ -0,0 +1,134 @@
+import threading
+from loguru import logger
+from typing import Callable, Dict, List
+from brain.naive import utils
+
+
+class EdgeWriteBuffer:
+    """Write-behind buffer for edge upserts. Edges are queued in memory and
+    written in the background when the buffer is full, every flush_interval
+    seconds, or on `close`. Writing the same edge again before a flush only
+    increases its count, so N reinforcements of a hot edge become a single
+    write that applies `Neo4j.calculate_confidence` N times.
+
+    :param write: function writing a list of edges, each a dict with n1, r,
+    n2, t1, t2 and count, in a single transaction
+    :type write: Callable[[List[Dict]], int]
+    :param max_pending: number of distinct queued edges that triggers a
+    flush, defaults to 1000
+    :type max_pending: int, optional
+    :param flush_interval: seconds between background flushes, None to only
+    flush when full or closed, defaults to 1.0
+    :type flush_interval: float, optional
+    :param batch_size: number of edges given to write at a time, defaults to
+    500
+    :type batch_size: int, optional
+    """
+
+    def __init__(self,
+                 write: Callable[[List[Dict]], int],
+                 max_pending: int = 1000,
+                 flush_interval: float = 1.0,
+                 batch_size: int = 500):
+        self.write = write
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wake = threading.Event()
+        self.closed = threading.Event()
+
+        # how many edges were queued, and how many writes they became
+        self.queued = 0
+        self.written = 0
+
+        self.thread = threading.Thread(target=self._run,
+                                       name="EdgeWriteBuffer",
+                                       daemon=True)
+        self.thread.start()
+
+    def add(self, edge: Dict) -> None:
+        """Queue an edge upsert without waiting for the database
+
+        :param edge: dict with n1, r, n2, t1, t2 and optionally count
+        :type edge: Dict
+        """
+        with self.lock:
+            self._merge(edge)
+            self.queued += edge.get("count", 1)
+            size = len(self.pending)
+
+        if size >= 2 * self.max_pending:
+            # the background writer can't keep up, so write in this thread
+            self.flush()
+        elif size >= self.max_pending:
+            self.wake.set()
+
+    def _merge(self, edge: Dict) -> None:
+        """Add an edge to the pending ones, coalescing repeated edges. Must be
+        called with the lock held.
+
+        :param edge: dict with n1, r, n2, t1, t2 and optionally count
+        :type edge: Dict
+        """
+        key = (edge["t1"], edge["t2"], edge["r"], edge["n1"], edge["n2"])
+        count = edge.get("count", 1)
+        if key in self.pending:
+            self.pending[key]["count"] += count
+        else:
+            self.pending[key] = dict(edge, count=count)
+
+    def flush(self) -> int:
+        """Write every queued edge now, one batch per call to write. If a
+        batch fails, it and the batches after it are queued again, while the
+        ones already written are not, so no edge is strengthened twice.
+
+        :return: number of edges written
+        :rtype: int
+        """
+        with self.flush_lock:
+            with self.lock:
+                edges = list(self.pending.values())
+                self.pending = {}
+            if not edges:
+                return 0
+
+            flushed = 0
+            for batch in utils.batched(edges, self.batch_size):
+                try:
+                    self.write(batch)
+                except Exception:
+                    # put the unwritten edges back so they are retried on
+                    #  the next flush
+                    with self.lock:
+                        for edge in edges[flushed:]:
+                            self._merge(edge)
+                    raise
+                flushed += len(batch)
+                self.written += len(batch)
+
+            logger.info(f"Flushed {flushed} edges "
+                        f"({self.queued} queued, {self.written} written)")
+            return flushed
+
+    def _run(self):
+        """Background loop flushing on interval or when the buffer is full
+        """
+        while not self.closed.is_set():
+            self.wake.wait(timeout=self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as exception:
+                logger.error(f"Background flush failed: {exception}")
+
+    def close(self) -> None:
+        """Stop the background writer and flush what is left
+        """
+        self.closed.set()
+        self.wake.set()
+        self.thread.join()
+        self.flush()
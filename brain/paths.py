@@ -0,0 +1,16 @@
+""" Locations shared by the brain packages. """
+import os
+from pathlib import Path
+
+
+def default_cache_dir() -> Path:
+    """Directory used for on-disk caches. It can be changed with the
+    BRAIN_CACHE_DIR environment variable.
+
+    :return: cache directory
+    :rtype: Path
+    """
+    cache_dir = os.environ.get("BRAIN_CACHE_DIR")
+    if cache_dir:
+        return Path(cache_dir)
+    return Path.home() / ".cache" / "brain"
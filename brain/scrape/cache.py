@@ -1,29 +1,273 @@
-from functools import lru_cache
-from brain.memory import Memory
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable
+from brain.scrape.memory import Memory
 
 
 class Cache:
+    """Bounded in-process cache. The least recently used entry is evicted
+    once there are more than size entries, and entries older than ttl seconds
+    are dropped when they are read. Safe to use from several threads. With a
+    memory behind it, evicted entries are moved down to the memory and
+    `search_query` falls back to it. A key is only ever in one of the two, and
+    putting or invalidating a key also replaces or removes it in the memory.
+    Keys can be indexed by tags, e.g. the names of the nodes a lookup read,
+    so `invalidate_tagged` only visits the entries of the given tags.
+
+    :param memory: memory behind the cache, defaults to None
+    :type memory: Memory, optional
+    :param size: maximum number of entries, defaults to 1000
+    :type size: int, optional
+    :param ttl: seconds an entry stays valid, None to never expire, defaults
+    to None
+    :type ttl: float, optional
+    :param tags: gives the tags of a key, defaults to None for no index
+    :type tags: Callable[[Hashable], Iterable[Hashable]], optional
+    """
 
     def __init__(self,
-                 memory: Memory,
-                 size: int = 1000):
+                 memory: Memory = None,
+                 size: int = 1000,
+                 ttl: float = None,
+                 tags: Callable[[Hashable], Iterable[Hashable]] = None):
         self.size = size
+        self.ttl = ttl
         self.memory = memory
+        self.tags = tags
+        # tag -> keys of the cached entries with that tag
+        self.tagged = {}
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # bumped by every invalidation, see put
+        self.generation = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a cached value and mark it as recently used
+
+        :param key: cache key
+        :type key: Hashable
+        :param default: returned if the key isn't cached or has expired,
+        defaults to None
+        :type default: Any, optional
+        :return: the cached value or default
+        :rtype: Any
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None \
+                    and time.monotonic() - entry[1] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self,
+            key: Hashable,
+            value: Any,
+            generation: int = None) -> bool:
+        """Cache a value, evicting the least recently used entries if the
+        cache is full. To cache the result of a lookup, read `generation`
+        before the lookup and pass it here: if anything was invalidated in
+        between, the result may be stale and isn't cached.
+
+        :param key: cache key
+        :type key: Hashable
+        :param value: value to cache
+        :type value: Any
+        :param generation: `generation` read before computing the value,
+        defaults to None to always cache it
+        :type generation: int, optional
+        :return: whether the value was cached
+        :rtype: bool
+        """
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return False
+            # a key already cached has no copy in the memory
+            cached = key in self.entries
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            if not cached and self.tags is not None:
+                for tag in self.tags(key):
+                    self.tagged.setdefault(tag, set()).add(key)
+            evicted = []
+            while len(self.entries) > self.size:
+                evicted_key = next(iter(self.entries))
+                evicted.append((evicted_key, self._remove(evicted_key)))
+                self.evictions += 1
+
+        # demote the least recently used entries to the memory, where an
+        #  older value of the key mustn't outlive this one
+        if self.memory is not None:
+            if not cached:
+                self.memory.delete(key)
+            for evicted_key, (evicted_value, _) in evicted:
+                self.memory.put(evicted_key, evicted_value)
+        return True
+
+    def invalidate(self, key: Hashable) -> bool:
+        """Remove an entry from the cache and the memory
+
+        :param key: cache key
+        :type key: Hashable
+        :return: whether the key was cached
+        :rtype: bool
+        """
+        with self.lock:
+            self.generation += 1
+            cached = self._remove(key) is not None
+            if cached:
+                self.invalidations += 1
+        if self.memory is not None:
+            self.memory.delete(key)
+        return cached
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key matches the predicate from the cache
+        and the memory
+
+        :param predicate: called with each key, True to remove the entry
+        :type predicate: Callable[[Hashable], bool]
+        :return: number of entries removed from the cache
+        :rtype: int
+        """
+        with self.lock:
+            self.generation += 1
+            keys = [key for key in self.entries if predicate(key)]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+        if self.memory is not None:
+            self.memory.delete_where(predicate)
+        return len(keys)
+
+    def invalidate_tagged(self, tags: Iterable[Hashable]) -> int:
+        """Remove every entry with any of the tags from the cache and the
+        memory. Only the entries of those tags are visited in the cache.
+
+        :param tags: tags of the entries to remove
+        :type tags: Iterable[Hashable]
+        :return: number of entries removed from the cache
+        :rtype: int
+        """
+        tags = set(tags)
+        with self.lock:
+            self.generation += 1
+            keys = set()
+            for tag in tags:
+                keys.update(self.tagged.get(tag, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+        if self.memory is not None and self.tags is not None:
+            self.memory.delete_where(
+                lambda key: not tags.isdisjoint(self.tags(key)))
+        return len(keys)
+
+    def clear(self) -> None:
+        """Remove every entry from the cache and the memory
+        """
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.tagged.clear()
+        if self.memory is not None:
+            self.memory.clear()
+
+    def _remove(self, key: Hashable) -> Any:
+        """Remove an entry and its tags. Must be called with the lock held.
+
+        :param key: cache key
+        :type key: Hashable
+        :return: the (value, time) entry, None if the key isn't cached
+        :rtype: Any
+        """
+        entry = self.entries.pop(key, None)
+        if entry is not None and self.tags is not None:
+            for tag in self.tags(key):
+                keys = self.tagged.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.tagged[tag]
+        return entry
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Hit and miss counters of this cache
+
+        :return: hits, misses, hit rate, evictions, invalidations and number
+        of cached entries
+        :rtype: Dict[str, float]
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions,
+                    "invalidations": self.invalidations,
+                    "size": len(self.entries)}
+
+    def scan_memory(self) -> int:
+        """Promote the most used entries of the memory into the cache
 
-        # needs to decorate the class methods here with decorator parameter
-        self.search_query = lru_cache(self.size)(self.search_query)
+        :return: number of entries promoted
+        :rtype: int
+        """
+        if self.memory is None:
+            return 0
+        promoted = 0
+        for key, value in self.memory.most_used(self.size):
+            with self.lock:
+                if key in self.entries:
+                    continue
+            self.put(key, value)
+            promoted += 1
+        return promoted
 
-    def scan_memory(self):
-        pass
+    def search_query(self, query: Hashable, default: Any = None) -> Any:
+        """Look a query up in the cache, then in the memory. A result found
+        in the memory is moved to the cache.
 
-    def search_query(self):
-        pass
+        :param query: the query, used as the key
+        :type query: Hashable
+        :param default: returned if the query is in neither, defaults to None
+        :type default: Any, optional
+        :return: the result of the query or default
+        :rtype: Any
+        """
+        missing = object()
+        result = self.get(query, missing)
+        if result is not missing:
+            return result
+        if self.memory is None:
+            return default
+        result = self.memory.get(query, missing)
+        if result is missing:
+            return default
+        self.put(query, result)
+        return result
 
 
 def main():
     memory = Memory(size=10000)
     cache = Cache(memory=memory,
                   size=1000)
+    cache.put("dog", ["animal", "pet"])
+    print(cache.search_query("dog"))
+    print(cache.stats, memory.stats)
+    memory.close()
 
 
 if __name__ == "__main__":
@@ -1,5 +1,299 @@
+import heapq
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Tuple
+
+LRU = "lru"
+LFU = "lfu"
+
+
 class Memory:
+    """Two tier store. Up to size entries are kept in RAM (the hot tier),
+    and the rest spill to a sqlite file on disk (the cold tier), so memory
+    use stays bounded however much is stored. Reading a cold entry moves it
+    back to the hot tier. When the hot tier is full, the least recently used
+    (lru) or least frequently used (lfu) entries are moved to disk, a tenth
+    of the tier at a time so each spill is one transaction. Keys are pickled
+    for the cold tier, so they should be strings or tuples of simple values.
+
+    :param size: maximum number of entries in RAM, defaults to 10000
+    :type size: int, optional
+    :param path: sqlite file of the cold tier, kept after `close`, defaults to
+    a temporary file of this instance deleted on `close`
+    :type path: Path, optional
+    :param policy: "lru" or "lfu", defaults to "lru"
+    :type policy: str, optional
+    """
 
     def __init__(self,
-                 size: int = 10000):
-        self.size = size
\ No newline at end of file
+                 size: int = 10000,
+                 path: Path = None,
+                 policy: str = LRU):
+        if policy not in (LRU, LFU):
+            raise ValueError(f"Unknown eviction policy {policy}")
+        self.size = size
+        self.policy = policy
+
+        # key -> [value, access count], oldest access first
+        self.hot = OrderedDict()
+        self.lock = threading.RLock()
+        self.hot_hits = 0
+        self.cold_hits = 0
+        self.misses = 0
+
+        # a file of our own, so memories don't see each other's entries
+        self.temporary = path is None
+        if self.temporary:
+            fd, path = tempfile.mkstemp(prefix="memory-", suffix=".sqlite")
+            os.close(fd)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS memory "
+                          "(key BLOB PRIMARY KEY, value BLOB, "
+                          "count INTEGER, accessed REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS memory_count "
+                          "ON memory (count)")
+        self.conn.commit()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a value, moving it to the hot tier if it was on disk
+
+        :param key: key of the value
+        :type key: Hashable
+        :param default: returned if the key isn't stored, defaults to None
+        :type default: Any, optional
+        :return: the value or default
+        :rtype: Any
+        """
+        with self.lock:
+            entry = self.hot.get(key)
+            if entry is not None:
+                self.hot.move_to_end(key)
+                entry[1] += 1
+                self.hot_hits += 1
+                return entry[0]
+
+            cold_key = pickle.dumps(key)
+            row = self.conn.execute(
+                "SELECT value, count FROM memory WHERE key = ?",
+                (cold_key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return default
+            with self.conn:
+                self.conn.execute("DELETE FROM memory WHERE key = ?",
+                                  (cold_key,))
+            self.cold_hits += 1
+            value = pickle.loads(row[0])
+            self.hot[key] = [value, row[1] + 1]
+            self._spill()
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value in the hot tier, spilling to disk if it's full
+
+        :param key: key of the value
+        :type key: Hashable
+        :param value: the value, must be picklable
+        :type value: Any
+        """
+        with self.lock:
+            entry = self.hot.get(key)
+            if entry is not None:
+                entry[0] = value
+                entry[1] += 1
+                self.hot.move_to_end(key)
+                return
+            cold_key = pickle.dumps(key)
+            row = self.conn.execute(
+                "SELECT count FROM memory WHERE key = ?",
+                (cold_key,)).fetchone()
+            if row is not None:
+                with self.conn:
+                    self.conn.execute("DELETE FROM memory WHERE key = ?",
+                                      (cold_key,))
+            self.hot[key] = [value, (row[0] if row else 0) + 1]
+            self._spill()
+
+    def delete(self, key: Hashable) -> bool:
+        """Remove a key from both tiers. Only writes to the sqlite file if
+        the key is on disk.
+
+        :param key: key of the value
+        :type key: Hashable
+        :return: whether the key was stored
+        :rtype: bool
+        """
+        with self.lock:
+            if self.hot.pop(key, None) is not None:
+                return True
+            cold_key = pickle.dumps(key)
+            if self.conn.execute("SELECT 1 FROM memory WHERE key = ?",
+                                 (cold_key,)).fetchone() is None:
+                return False
+            with self.conn:
+                self.conn.execute("DELETE FROM memory WHERE key = ?",
+                                  (cold_key,))
+            return True
+
+    def delete_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every key matching the predicate from both tiers, with the
+        keys on disk removed in one transaction. Only the keys are read from
+        disk, not the values.
+
+        :param predicate: called with each key, True to remove it
+        :type predicate: Callable[[Hashable], bool]
+        :return: number of keys removed
+        :rtype: int
+        """
+        with self.lock:
+            hot = [key for key in self.hot if predicate(key)]
+            for key in hot:
+                del self.hot[key]
+            cold = [(cold_key,) for cold_key, in
+                    self.conn.execute("SELECT key FROM memory")
+                    if predicate(pickle.loads(cold_key))]
+            if cold:
+                with self.conn:
+                    self.conn.executemany("DELETE FROM memory WHERE key = ?",
+                                          cold)
+            return len(hot) + len(cold)
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers
+        """
+        with self.lock:
+            self.hot.clear()
+            with self.conn:
+                self.conn.execute("DELETE FROM memory")
+
+    def _spill(self) -> None:
+        """Move entries to disk once the hot tier is over its size. Must be
+        called with the lock held.
+        """
+        if len(self.hot) <= self.size:
+            return
+        count = len(self.hot) - self.size + max(self.size // 10, 1)
+        if self.policy == LRU:
+            keys = [key for key, _ in zip(self.hot, range(count))]
+        else:
+            # least used first, the older one on ties
+            order = {key: position for position, key in enumerate(self.hot)}
+            keys = heapq.nsmallest(
+                count, self.hot,
+                key=lambda key: (self.hot[key][1], order[key]))
+
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO memory VALUES (?, ?, ?, ?)",
+                [(pickle.dumps(key), pickle.dumps(self.hot[key][0]),
+                  self.hot[key][1], now) for key in keys])
+        for key in keys:
+            del self.hot[key]
+
+    def most_used(self, n: int) -> List[Tuple[Hashable, Any]]:
+        """The n most accessed entries of both tiers
+
+        :param n: number of entries
+        :type n: int
+        :return: (key, value) pairs, most accessed first
+        :rtype: List[Tuple[Hashable, Any]]
+        """
+        with self.lock:
+            hot = [(entry[1], key, entry[0])
+                   for key, entry in self.hot.items()]
+            cold = [(count, pickle.loads(key), pickle.loads(value))
+                    for key, value, count in self.conn.execute(
+                        "SELECT key, value, count FROM memory "
+                        "ORDER BY count DESC LIMIT ?", (n,))]
+        entries = heapq.nlargest(n, hot + cold, key=lambda entry: entry[0])
+        return [(key, value) for _, key, value in entries]
+
+    def scan(self,
+             predicate: Callable[[Hashable, Any], bool] = None
+             ) -> Iterator[Tuple[Hashable, Any]]:
+        """Go through every entry, hot ones first, without changing access
+        counts
+
+        :param predicate: called with each key and value, only the entries
+        it returns True for are yielded, defaults to all entries
+        :type predicate: Callable[[Hashable, Any], bool], optional
+        :yield: (key, value) pairs
+        :rtype: Iterator[Tuple[Hashable, Any]]
+        """
+        with self.lock:
+            hot = [(key, entry[0]) for key, entry in self.hot.items()]
+        for key, value in hot:
+            if predicate is None or predicate(key, value):
+                yield key, value
+        cursor = self.conn.execute("SELECT key, value FROM memory")
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for key, value in rows:
+                key, value = pickle.loads(key), pickle.loads(value)
+                if predicate is None or predicate(key, value):
+                    yield key, value
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.lock:
+            if key in self.hot:
+                return True
+            return self.conn.execute(
+                "SELECT 1 FROM memory WHERE key = ?",
+                (pickle.dumps(key),)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self.lock:
+            cold = self.conn.execute(
+                "SELECT COUNT(*) FROM memory").fetchone()[0]
+            return len(self.hot) + cold
+
+    @property
+    def stats(self) -> Dict[str, float]:
+        """Hit and miss counters of both tiers
+
+        :return: hits of each tier, misses, hit rate and number of entries in
+        each tier
+        :rtype: Dict[str, float]
+        """
+        with self.lock:
+            lookups = self.hot_hits + self.cold_hits + self.misses
+            cold = self.conn.execute(
+                "SELECT COUNT(*) FROM memory").fetchone()[0]
+            return {"hot_hits": self.hot_hits,
+                    "cold_hits": self.cold_hits,
+                    "misses": self.misses,
+                    "hit_rate": (self.hot_hits + self.cold_hits) / lookups
+                    if lookups else 0.0,
+                    "hot_size": len(self.hot),
+                    "cold_size": cold}
+
+    def close(self) -> None:
+        """Move the hot tier to disk and close the sqlite file, or delete it
+        if it's temporary
+        """
+        with self.lock:
+            if not self.temporary:
+                now = time.time()
+                with self.conn:
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO memory VALUES (?, ?, ?, ?)",
+                        [(pickle.dumps(key), pickle.dumps(entry[0]),
+                          entry[1], now)
+                         for key, entry in self.hot.items()])
+            self.hot.clear()
+            self.conn.close()
+            if self.temporary:
+                for suffix in ("", "-wal", "-shm"):
+                    Path(f"{self.path}{suffix}").unlink(missing_ok=True)
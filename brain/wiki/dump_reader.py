@@ -0,0 +1,191 @@
+""" Read articles straight from a Wikipedia pages-articles xml dump """
+import bz2
+import html
+import io
+import re
+import sqlite3
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import IO, Iterator, Optional, Tuple
+
+CHUNK_SIZE = 1 << 20
+TITLE_PATTERN = re.compile(rb'<title>(.*?)</title>')
+# longer than any <title> element, titles are at most 255 bytes
+MAX_TITLE_SIZE = 512
+
+
+class WikiDump:
+    ''' Stream articles from a pages-articles.xml.bz2 dump, or look up a
+    single article in a multistream dump through a byte offset index '''
+
+    def __init__(self,
+                 dump_path: Path,
+                 index_path: Path = None,
+                 index_db: Path = None) -> None:
+        self.dump_path = Path(dump_path)
+
+        # the official multistream index (offset:page_id:title per line)
+        self.index_path = Path(index_path) if index_path else None
+
+        # sqlite file with the title -> stream offset lookups
+        self.index_db = Path(index_db) if index_db else \
+            self.dump_path.with_name(self.dump_path.name + '.index.sqlite')
+        self.conn = None
+
+    @staticmethod
+    def _tag(element: ET.Element) -> str:
+        ''' Tag name without the xml namespace '''
+        return element.tag.rsplit('}', 1)[-1]
+
+    @classmethod
+    def _child(cls,
+               element: ET.Element,
+               name: str) -> Optional[ET.Element]:
+        ''' First child element with the given tag name '''
+        for child in element:
+            if cls._tag(child) == name:
+                return child
+        return None
+
+    @classmethod
+    def parse_pages(cls, stream: IO[bytes]) -> Iterator[Tuple[str, str]]:
+        ''' Incrementally parse <page> elements, yielding (title, wikitext)
+        of every article that isn't a redirect. Elements are cleared once
+        they are read so memory stays flat. '''
+        context = ET.iterparse(stream, events=('start', 'end'))
+        _, root = next(context)
+        for event, element in context:
+            if event != 'end' or cls._tag(element) != 'page':
+                continue
+
+            title = cls._child(element, 'title')
+            namespace = cls._child(element, 'ns')
+            revision = cls._child(element, 'revision')
+            text = cls._child(revision, 'text') \
+                if revision is not None else None
+            is_article = namespace is None or namespace.text == '0'
+            is_redirect = cls._child(element, 'redirect') is not None
+
+            if title is not None and is_article and not is_redirect:
+                wikitext = text.text if text is not None else None
+                yield title.text, wikitext or ''
+
+            # drop the parsed pages from the tree
+            root.clear()
+
+    def iter_pages(self) -> Iterator[Tuple[str, str]]:
+        ''' Lazily yield (title, wikitext) for every article in the dump '''
+        with bz2.open(self.dump_path, 'rb') as dump:
+            yield from self.parse_pages(dump)
+
+    def iter_chunks(self, offset: int = 0) -> Iterator[Tuple[int, bytes]]:
+        ''' Yield (stream offset, decompressed chunk) for the data of every
+        bz2 stream in a multistream dump, starting at the given byte offset.
+        Chunks are yielded as they are decompressed, so memory stays flat
+        even if a stream is large. '''
+        with self.dump_path.open('rb') as dump:
+            dump.seek(offset)
+            pending = b''
+            while True:
+                decompressor = bz2.BZ2Decompressor()
+                start = offset
+                while not decompressor.eof:
+                    chunk = pending or dump.read(CHUNK_SIZE)
+                    pending = b''
+                    if not chunk:
+                        return
+                    offset += len(chunk)
+                    yield start, decompressor.decompress(chunk)
+
+                pending = decompressor.unused_data
+                offset -= len(pending)
+
+    def iter_streams(self, offset: int = 0) -> Iterator[Tuple[int, bytes]]:
+        ''' Yield (offset, decompressed data) of every bz2 stream in a
+        multistream dump, starting at the given byte offset '''
+        data = []
+        current = offset
+        for start, chunk in self.iter_chunks(offset):
+            if start != current and data:
+                yield current, b''.join(data)
+                data = []
+            current = start
+            data.append(chunk)
+        if data:
+            yield current, b''.join(data)
+
+    def _connect(self) -> sqlite3.Connection:
+        ''' Open the offset index database '''
+        if self.conn is None:
+            self.conn = sqlite3.connect(str(self.index_db),
+                                        check_same_thread=False)
+            self.conn.execute('CREATE TABLE IF NOT EXISTS offsets '
+                              '(title TEXT PRIMARY KEY, offset INTEGER)')
+        return self.conn
+
+    def _index_rows(self) -> Iterator[Tuple[str, int]]:
+        ''' (title, offset) pairs from the official index, or from scanning
+        the dump stream by stream if there is no index file '''
+        if self.index_path:
+            with bz2.open(self.index_path, 'rt', encoding='utf-8') as index:
+                for line in index:
+                    offset, _, title = line.rstrip('\n').split(':', 2)
+                    yield title, int(offset)
+        else:
+            # carry the end of a chunk over, a title can span two chunks
+            tail = b''
+            current = 0
+            for offset, chunk in self.iter_chunks():
+                if offset != current:
+                    tail = b''
+                    current = offset
+                data = tail + chunk
+                end = 0
+                for match in TITLE_PATTERN.finditer(data):
+                    # the first stream of a multistream dump only holds
+                    #  the site info, so a page there means a single stream
+                    if offset == 0:
+                        raise ValueError(
+                            f'{self.dump_path} is not a multistream dump, '
+                            f'give index_path or use iter_pages')
+                    yield html.unescape(
+                        match.group(1).decode('utf-8')), offset
+                    end = match.end()
+                tail = data[max(end, len(data) - MAX_TITLE_SIZE):]
+
+    def build_index(self) -> int:
+        ''' Build the title -> stream offset index, return the number of
+        titles indexed '''
+        conn = self._connect()
+        # one transaction, so a failed scan leaves the old index
+        with conn:
+            conn.execute('DELETE FROM offsets')
+            conn.executemany('INSERT OR REPLACE INTO offsets VALUES (?, ?)',
+                             self._index_rows())
+        return conn.execute('SELECT COUNT(*) FROM offsets').fetchone()[0]
+
+    def get_article(self, title: str) -> Optional[str]:
+        ''' Seek to the stream holding the article and decompress only that
+        stream. The index is built on first use, which needs a multistream
+        dump or its index file. '''
+        conn = self._connect()
+        if conn.execute('SELECT 1 FROM offsets LIMIT 1').fetchone() is None:
+            self.build_index()
+
+        row = conn.execute('SELECT offset FROM offsets WHERE title = ?',
+                           (title,)).fetchone()
+        if row is None:
+            return None
+
+        _, data = next(self.iter_streams(offset=row[0]))
+        pages = io.BytesIO(b'<pages>' + data + b'</pages>')
+        for page_title, text in self.parse_pages(pages):
+            if page_title == title:
+                return text
+        return None
+
+    def close(self) -> None:
+        ''' Close the offset index database '''
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,63 @@
+""" Store the wiki keyword to text id lookups on disk """
+import os
+import sqlite3
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+from brain.paths import default_cache_dir
+
+
+class KeywordIdStore:
+    ''' SQLite backed keyword -> text id store, the old_id of the text of
+    the latest revision of the page. The database runs in WAL mode so several
+    worker processes can read and write it at the same time, and the
+    connection is only opened on first use (and re-opened in a forked
+    process). Any object with the same get, put and put_many methods can be
+    given to WikiParser instead. '''
+
+    def __init__(self, path: Path = None) -> None:
+        self.path = Path(path) if path else \
+            default_cache_dir() / 'keyword_text_id.sqlite'
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        ''' Connection of the current process, opened lazily '''
+        if self._conn is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path),
+                                         timeout=30,
+                                         check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS keyword_ids '
+                               '(keyword TEXT PRIMARY KEY, '
+                               'keyword_id INTEGER NOT NULL)')
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, keyword: str) -> Optional[int]:
+        ''' Get the text id of a keyword, None if it's not stored '''
+        row = self.conn.execute(
+            'SELECT keyword_id FROM keyword_ids WHERE keyword = ?',
+            (keyword,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, keyword: str, keyword_id: int) -> None:
+        ''' Store the text id of a keyword '''
+        self.put_many([(keyword, keyword_id)])
+
+    def put_many(self, items: Iterable[Tuple[str, int]]) -> None:
+        ''' Store many (keyword, text id) pairs in one transaction '''
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO keyword_ids VALUES (?, ?)', items)
+
+    def __contains__(self, keyword: str) -> bool:
+        return self.get(keyword) is not None
+
+    def close(self) -> None:
+        ''' Close the connection '''
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
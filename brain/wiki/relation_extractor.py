@@ -0,0 +1,242 @@
+""" Extract ConceptNet style relations from Wikipedia plain text """
+import argparse
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+from loguru import logger
+from brain.concept_net.concept_net import Neo4jTypesEnum
+from brain.naive.neo4j_db import Neo4j
+from brain.naive import utils
+from brain.wiki.wiki_reader import WikiParser
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(])')
+
+STOP_WORDS = {'the', 'a', 'an', 'this', 'that', 'these', 'those', 'it',
+              'its', 'their', 'his', 'her', 'our', 'your', 'which', 'who',
+              'and', 'or', 'also', 'be', 'to', 'of', 'in', 'on', 'at'}
+# words a phrase never runs across, so it ends at the clause it started in
+BREAK_WORDS = STOP_WORDS | {'but', 'nor', 'so', 'yet', 'because', 'while',
+                            'although', 'if', 'then', 'when', 'where',
+                            'is', 'are', 'was', 'were', 'been', 'being',
+                            'can', 'not'}
+
+# a noun phrase of up to three words, none of them a break word
+WORD = (rf"(?!(?:{'|'.join(sorted(BREAK_WORDS))})\b)"
+        r"[a-z][a-z'-]*")
+PHRASE = rf"\b((?:{WORD}\s){{0,2}}{WORD})"
+BE = r"(?:is|are|was|were)"
+DETERMINER = r"(?:(?:the|a|an)\s)?"
+
+# surface patterns for each relationship, checked in order so the more
+#  specific patterns win (e.g. "can be" before "can")
+PATTERNS = [
+    (Neo4jTypesEnum.PART_OF,
+     rf"{PHRASE}\s{BE}\s(?:a\s)?part\sof\s{DETERMINER}{PHRASE}"),
+    (Neo4jTypesEnum.AT_LOCATION,
+     rf"{PHRASE}\s{BE}\s(?:located|found|situated)\s(?:in|at|on)\s"
+     rf"{DETERMINER}{PHRASE}"),
+    (Neo4jTypesEnum.USED_FOR,
+     rf"{PHRASE}\s(?:{BE}|can\sbe)\s(?:commonly\s|often\s|mainly\s)?"
+     rf"used\s(?:for|to)\s{DETERMINER}{PHRASE}"),
+    (Neo4jTypesEnum.RECIEVES_ACTION,
+     rf"{PHRASE}\scan\sbe\s(?!(?:commonly\s|often\s|mainly\s)?"
+     rf"used\s(?:for|to)\s){PHRASE}"),
+    (Neo4jTypesEnum.CAPABLE_OF,
+     rf"{PHRASE}\scan\s(?!be\s|not\s){PHRASE}"),
+    (Neo4jTypesEnum.HAS_PROPERTY,
+     rf"{PHRASE}\s{BE}\s(?:very|usually|often|typically|generally)\s"
+     rf"{PHRASE}"),
+    (Neo4jTypesEnum.CAUSE_DESIRE,
+     rf"{PHRASE}\s(?:makes|make)\s(?:people|you|one)\swant\s(?:to\s)?"
+     rf"{DETERMINER}{PHRASE}"),
+    (Neo4jTypesEnum.MOTIVATED_BY_GOAL,
+     rf"{PHRASE}\sin\sorder\sto\s{PHRASE}"),
+    (Neo4jTypesEnum.HAS_PREREQUISITE,
+     rf"{PHRASE}\s(?:requires|require|needs|need)\s{DETERMINER}{PHRASE}"),
+    (Neo4jTypesEnum.HAS_SUBEVENT,
+     rf"{PHRASE}\s(?:involves|involve)\s{DETERMINER}{PHRASE}"),
+]
+PATTERNS = [(relation, re.compile(pattern)) for relation, pattern in PATTERNS]
+
+
+@dataclass
+class StageStats:
+    """Throughput counter of one pipeline stage
+
+    :param name: name of the stage
+    :type name: str
+    :param items: number of items produced by the stage
+    :type items: int
+    :param seconds: time spent in the stage
+    :type seconds: float
+    """
+    name: str
+    items: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Items produced per second spent in the stage
+
+        :return: items per second
+        :rtype: float
+        """
+        return self.items / self.seconds if self.seconds else 0.0
+
+
+def to_term(phrase: str) -> Optional[str]:
+    """Turn a matched phrase into a ConceptNet style term, e.g. "the solar
+    system" to "solar_system"
+
+    :param phrase: the matched phrase
+    :type phrase: str
+    :return: the term, None if only stop words are left
+    :rtype: Optional[str]
+    """
+    words = phrase.split()
+    while words and words[0] in STOP_WORDS:
+        words.pop(0)
+    while words and words[-1] in STOP_WORDS:
+        words.pop()
+    return "_".join(words) if words else None
+
+
+class RelationPipeline:
+    """Streaming pipeline that breaks plain text into sentences, extracts
+    (n1, r, n2) triples whose relationship is one of Neo4jTypesEnum, and
+    writes them to Neo4j in batches. Time and item counts are tracked for
+    every stage so it's easy to see where the time goes.
+
+    :param app: the Neo4j database to write to
+    :type app: Neo4j
+    :param node_type: node type of the extracted concepts, defaults to
+    "unknown"
+    :type node_type: str, optional
+    :param batch_size: number of relations written per batch, defaults to 1000
+    :type batch_size: int, optional
+    """
+
+    def __init__(self,
+                 app: Neo4j,
+                 node_type: str = "unknown",
+                 batch_size: int = 1000):
+        self.app = app
+        self.node_type = node_type
+        self.batch_size = batch_size
+        self.stats = {name: StageStats(name=name)
+                      for name in ("sentences", "relations", "writes")}
+
+    def sentences(self, texts: Iterable[str]) -> Iterator[str]:
+        """Break plain texts into sentences
+
+        :param texts: plain text of the articles
+        :type texts: Iterable[str]
+        :yield: sentence
+        :rtype: Iterator[str]
+        """
+        stats = self.stats["sentences"]
+        for text in texts:
+            start = time.perf_counter()
+            sentences = [x.strip() for x in SENTENCE_BOUNDARY.split(text)
+                         if x.strip()]
+            stats.seconds += time.perf_counter() - start
+            stats.items += len(sentences)
+            yield from sentences
+
+    def relations(self, sentences: Iterable[str]) -> Iterator[Dict]:
+        """Extract candidate relations from sentences
+
+        :param sentences: sentences to extract from
+        :type sentences: Iterable[str]
+        :yield: relation as a dict with n1, r and n2
+        :rtype: Iterator[Dict]
+        """
+        stats = self.stats["relations"]
+        for sentence in sentences:
+            start = time.perf_counter()
+            found = self.extract(sentence)
+            stats.seconds += time.perf_counter() - start
+            stats.items += len(found)
+            yield from found
+
+    @staticmethod
+    def extract(sentence: str) -> List[Dict]:
+        """Extract the relations of a single sentence
+
+        :param sentence: the sentence
+        :type sentence: str
+        :return: relations as dicts with n1, r and n2
+        :rtype: List[Dict]
+        """
+        sentence = sentence.lower()
+        found = []
+        for relation, pattern in PATTERNS:
+            for match in pattern.finditer(sentence):
+                node1 = to_term(match.group(1))
+                node2 = to_term(match.group(2))
+                if node1 and node2 and node1 != node2:
+                    found.append({'n1': node1,
+                                  'r': relation.value,
+                                  'n2': node2})
+        return found
+
+    def run(self, texts: Iterable[str]) -> int:
+        """Run the whole pipeline over the texts
+
+        :param texts: plain text of the articles
+        :type texts: Iterable[str]
+        :return: number of relations written
+        :rtype: int
+        """
+        stats = self.stats["writes"]
+        relations = self.relations(self.sentences(texts))
+        for batch in utils.batched(relations, self.batch_size):
+            start = time.perf_counter()
+            stats.items += self.app.create_edges(edges=batch,
+                                                 node_type=self.node_type,
+                                                 batch_size=self.batch_size)
+            stats.seconds += time.perf_counter() - start
+            self.report()
+        return stats.items
+
+    def report(self) -> None:
+        """Log the throughput of every stage
+        """
+        logger.info(", ".join(f"{x.name}: {x.items} ({x.rate:.0f}/s)"
+                              for x in self.stats.values()))
+
+
+def get_args():
+    parser = argparse.ArgumentParser(
+        description='Extract relations from Wikipedia articles into Neo4j')
+    parser.add_argument('-k',
+                        '--keywords',
+                        type=str,
+                        nargs='+',
+                        help='titles of the Wikipedia articles')
+    parser.add_argument('-w',
+                        '--workers',
+                        type=int,
+                        default=None,
+                        help='number of processes converting wiki text')
+
+    args = parser.parse_args()
+    return args
+
+
+def main():
+    args = get_args()
+    parser = WikiParser(keyword=args.keywords[0])
+    texts = (text for _, text in parser.get_texts(keywords=args.keywords,
+                                                  workers=args.workers)
+             if text)
+    app = Neo4j()
+    pipeline = RelationPipeline(app=app)
+    pipeline.run(texts=texts)
+    app.close()
+
+
+if __name__ == '__main__':
+    logger.add("relation_extraction.log")
+    main()
@@ -1,63 +1,60 @@
-from brain import Database
+from brain.database.read_sql import Database
+from brain.wiki.dump_reader import WikiDump
+from brain.wiki.keyword_store import KeywordIdStore
+from brain.naive import utils
 import mwparserfromhell
 import wikitextparser as wtp
-import json
-import importlib.resources
+import threading
+from multiprocessing import Pool
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
 
 class WikiParser:
 
     def __init__(self,
                  keyword: str,
-                 database: str = 'wiki_en') -> None:
-        self.database = Database(database=database)
+                 database: str = 'wiki_en',
+                 dump: WikiDump = None,
+                 keyword_store: KeywordIdStore = None) -> None:
+        # read articles from the xml dump if one is given, otherwise from
+        #  the MySQL import of the dump
+        self.dump = dump
+        self.database = Database(database=database) if dump is None else None
         self.keyword = keyword
 
-        # get keyword id cache, supposely
-        cache_file = 'wiki/data/keyword_id.json'
-        self.cache_path = importlib.resources.files("brain") / cache_file
-        self.get_keyword_ids()
-
-    def get_keyword_ids(self):
-        ''' Get the keyword id from the cache file '''
-        if self.cache_path.exists():
-            with self.cache_path.open('r') as f:
-                self.keyword_ids = json.load(f)
-        else:
-            with self.cache_path.open('w') as f:
-                self.keyword_ids = {}
-                json.dump(self.keyword_ids, f)
-
-    def cache_keyword_id(self):
-        ''' Cache the keyword id to the keyword_id.json file '''
-        if self.cache_path.exists():
-            with self.cache_path.open('w') as f:
-                json.dump(self.keyword_ids, f)
-
-    def get_keyword_id(self):
-        ''' Get the keyword id from the database '''
+        # keyword id cache, only opened when it's first used
+        self.keyword_ids = keyword_store or KeywordIdStore()
+
+    def get_keyword_id(self, keyword: str = None):
+        ''' Get the keyword id from the database, the id of the text of the
+        latest revision of the page, i.e. the old_id in the text table '''
+        keyword = keyword or self.keyword
         query = """
-                SELECT page_latest
+                SELECT rev_text_id
                 FROM page
+                JOIN revision ON rev_id = page_latest
                 WHERE page_title like %s;
                 """
 
         result = self.database.query(query=query,
-                                     params=(self.keyword,))
+                                     params=(keyword,))
 
         # cache the keyword id
-        self.keyword_ids[self.keyword] = result[0][0]
-        self.cache_keyword_id()
+        self.keyword_ids.put(keyword, result[0][0])
         return result[0][0]
 
-    def get_wiki_text(self):
+    def get_wiki_text(self, keyword: str = None):
         ''' Get the wiki format text from the database '''
+        keyword = keyword or self.keyword
+
+        if self.dump is not None:
+            # dump titles use spaces where database titles use underscores
+            return self.dump.get_article(keyword.replace('_', ' '))
 
         # get the keyword id
-        if self.keyword in self.keyword_ids:
-            keyword_id = self.keyword_ids[self.keyword]
-        else:
-            keyword_id = self.get_keyword_id()
+        keyword_id = self.keyword_ids.get(keyword)
+        if keyword_id is None:
+            keyword_id = self.get_keyword_id(keyword=keyword)
 
         # query the database
         query = '''
@@ -69,6 +66,46 @@ class WikiParser:
                                      params=(keyword_id,))
         return result[0][0]
 
+    def get_wiki_texts(self,
+                       keywords: Iterable[str],
+                       batch_size: int = 500) -> Dict[str, Optional[str]]:
+        ''' Get the wiki format text of many keywords at once. The text ids
+        and the text are fetched together with one exact match IN query per
+        batch of keywords, and the keyword ids are cached in bulk. Keywords
+        without a page map to None. '''
+        keywords = list(dict.fromkeys(keywords))
+
+        if self.dump is not None:
+            return {keyword: self.get_wiki_text(keyword=keyword)
+                    for keyword in keywords}
+
+        texts = {}
+        keyword_ids = []
+        for start in range(0, len(keywords), batch_size):
+            batch = keywords[start:start + batch_size]
+            placeholders = ", ".join(["%s"] * len(batch))
+            query = f"""
+                    SELECT page_title, rev_text_id,
+                           CONVERT(old_text USING utf8)
+                    FROM page
+                    JOIN revision ON rev_id = page_latest
+                    JOIN text ON old_id = rev_text_id
+                    WHERE page_namespace = 0
+                      AND page_title IN ({placeholders});
+                    """
+            result = self.database.query(query=query,
+                                         params=tuple(batch))
+
+            for title, keyword_id, text in result or []:
+                # page_title is a binary column
+                if isinstance(title, (bytes, bytearray)):
+                    title = title.decode('utf-8')
+                texts[title] = text
+                keyword_ids.append((title, keyword_id))
+
+        self.keyword_ids.put_many(keyword_ids)
+        return {keyword: texts.get(keyword) for keyword in keywords}
+
     def remove_extra_formatting(self, text: str) -> str:
         extra_sections = ['References', 'External links', 'See also',
                           'Further reading', 'Notes']
@@ -81,16 +118,16 @@ class WikiParser:
         plain_text = wiki_text.strip_code()
         return plain_text
 
-    def get_text(self):
-        ''' Convert the wiki format text to plain text '''
-
-        wiki_text = self.get_wiki_text()
+    @classmethod
+    def convert_wiki_text(cls, wiki_text: str) -> str:
+        ''' Convert the wiki format text to plain text, without the extra
+        sections like references or external links '''
 
         # Put the wiki text in sectios, and filter out the extra sections
         sectioned_text = wtp.parse(wiki_text)
         extra_sections = ['References', 'External links', 'See also',
                           'Further reading', 'Notes', 'Maps']
-        parsed_sections = [self.parse_wiki_text(str(x))
+        parsed_sections = [cls.parse_wiki_text(str(x))
                            for x in sectioned_text.sections
                            if not x.title or 
                                x.title.strip() not in extra_sections]
@@ -100,6 +137,66 @@ class WikiParser:
 
         return stripped_text
 
+    def get_text(self):
+        ''' Convert the wiki format text to plain text '''
+
+        wiki_text = self.get_wiki_text()
+        return self.convert_wiki_text(wiki_text)
+
+    def get_texts(self,
+                  keywords: Iterable[str],
+                  workers: int = None,
+                  chunksize: int = 16,
+                  ordered: bool = True,
+                  batch_size: int = 500,
+                  max_pending: int = 1000) -> Iterator[Tuple[str, str]]:
+        ''' Convert many articles to plain text on a process pool. The wiki
+        text is read in this process in batches of keywords and handed to
+        the workers in chunks of articles, and (keyword, plain text) pairs are
+        streamed back as they finish, in the order of the keywords unless
+        ordered is False. At most max_pending articles are read but not yet
+        consumed, so a slow consumer doesn't let results pile up. '''
+        articles = (article
+                    for batch in utils.batched(keywords, batch_size)
+                    for article in self.get_wiki_texts(
+                        keywords=batch,
+                        batch_size=batch_size).items())
+
+        # the pool feeds itself from a thread, a slot is taken for every
+        #  article handed to it and given back when its result is yielded
+        window = threading.Semaphore(max(max_pending, chunksize))
+        stop = threading.Event()
+
+        def feed():
+            for article in articles:
+                while not window.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                yield article
+
+        with Pool(processes=workers) as pool:
+            if ordered:
+                results = pool.imap(convert_article, feed(), chunksize)
+            else:
+                results = pool.imap_unordered(convert_article, feed(),
+                                              chunksize)
+            try:
+                for result in results:
+                    window.release()
+                    yield result
+            finally:
+                # let the feeding thread finish if the consumer stops early
+                stop.set()
+
+
+def convert_article(article: Tuple[str, Optional[str]]
+                    ) -> Tuple[str, Optional[str]]:
+    ''' Process pool worker converting one (keyword, wiki text) pair '''
+    keyword, wiki_text = article
+    if wiki_text is None:
+        return keyword, None
+    return keyword, WikiParser.convert_wiki_text(wiki_text)
+
 
 def main():
 
@@ -0,0 +1,73 @@
+import pytest
+from brain.scrape.cache import Cache
+from brain.scrape.memory import Memory
+
+
+@pytest.fixture
+def memory():
+    memory = Memory(size=10)
+    yield memory
+    memory.close()
+
+
+def test_least_recently_used_is_evicted():
+    cache = Cache(size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats["evictions"] == 1
+
+
+def test_lookup_raced_by_an_invalidation_is_not_cached():
+    cache = Cache()
+    generation = cache.generation
+    # a write invalidates while the lookup is running
+    cache.invalidate("other")
+    assert not cache.put("key", "stale", generation=generation)
+    assert cache.get("key") is None
+    assert cache.put("key", "fresh", generation=cache.generation)
+    assert cache.get("key") == "fresh"
+
+
+def test_invalidate_tagged_only_drops_those_tags():
+    cache = Cache(tags=lambda key: key[1:])
+    cache.put(("edge", "a", "b"), 1)
+    cache.put(("node", "b"), 2)
+    cache.put(("node", "c"), 3)
+    assert cache.invalidate_tagged(["b"]) == 2
+    assert cache.get(("node", "c")) == 3
+    assert cache.tagged == {"c": {("node", "c")}}
+
+
+def test_evicted_entries_are_searched_in_memory(memory):
+    cache = Cache(memory=memory, size=1)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert "a" in memory
+    assert cache.search_query("a") == 1
+    # promoted, so only the cache has it
+    assert "a" not in memory and "b" in memory
+
+
+def test_invalidated_key_does_not_come_back_from_memory(memory):
+    cache = Cache(memory=memory, size=1)
+    cache.put("a", "v1")
+    cache.put("b", 0)
+    cache.search_query("a")
+    cache.put("b", 0)
+    cache.put("a", "v2")
+    cache.invalidate("a")
+    assert cache.search_query("a") is None
+
+
+def test_invalidate_where_and_clear_reach_memory(memory):
+    cache = Cache(memory=memory, size=1)
+    for key in ("a1", "a2", "b1"):
+        cache.put(key, key)
+    cache.invalidate_where(lambda key: key.startswith("a"))
+    assert "a1" not in memory and "a2" not in memory
+    cache.clear()
+    assert len(memory) == 0 and cache.get("b1") is None
@@ -0,0 +1,93 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from brain.concept_net.cache import ResponseCache
+from brain.concept_net.client import ConceptNetClient
+from brain.concept_net.concept_net import ConceptNet
+
+
+@pytest.fixture
+def api():
+    """Local stand-in for the ConceptNet API, answering every url with the
+    path and counting the requests
+    """
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            body = json.dumps({"@id": self.path, "edges": []}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_hit_skips_the_api(api, tmp_path):
+    api_url, requests = api
+    cache = ResponseCache(path=tmp_path / "conceptnet.sqlite")
+    concept = ConceptNet(concept_name="dog",
+                         api_url=api_url,
+                         cache=cache,
+                         client=ConceptNetClient())
+
+    assert concept.get_concepts() == {"@id": "/c/en/dog", "edges": []}
+    assert concept.get_concepts() == {"@id": "/c/en/dog", "edges": []}
+    assert requests == ["/c/en/dog"]
+    assert cache.stats["hits"] == 1 and cache.stats["misses"] == 1
+    cache.close()
+
+
+def test_persists_across_instances(api, tmp_path):
+    api_url, requests = api
+    path = tmp_path / "conceptnet.sqlite"
+    for _ in range(2):
+        cache = ResponseCache(path=path)
+        ConceptNet.get_many(concepts=["dog", "cat"],
+                            api_url=api_url,
+                            cache=cache,
+                            client=ConceptNetClient())
+        cache.close()
+    assert sorted(requests) == ["/c/en/cat", "/c/en/dog"]
+
+
+def test_expired_entry_is_fetched_again(api, tmp_path):
+    api_url, requests = api
+    cache = ResponseCache(path=tmp_path / "conceptnet.sqlite", ttl=0)
+    concept = ConceptNet(concept_name="dog",
+                         api_url=api_url,
+                         cache=cache,
+                         client=ConceptNetClient())
+    concept.get_concepts()
+    concept.get_concepts()
+    assert len(requests) == 2
+    cache.close()
+
+
+def test_hit_refreshes_access_time_only_when_stale(tmp_path):
+    cache = ResponseCache(path=tmp_path / "conceptnet.sqlite", refresh=60)
+    cache.set("url", {"a": 1})
+    cache.conn.execute("UPDATE responses SET accessed = 0")
+    assert cache.get("url") == {"a": 1}
+    accessed = cache.conn.execute(
+        "SELECT accessed FROM responses").fetchone()[0]
+    assert accessed > 0
+
+    cache.conn.execute("UPDATE responses SET accessed = ?", (accessed,))
+    cache.conn.commit()
+    changes = cache.conn.total_changes
+    cache.get("url")
+    assert cache.conn.total_changes == changes
+    cache.close()
@@ -0,0 +1,30 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# loaded only when the class needing them is used, see brain/__init__.py
+HEAVY_MODULES = ("neo4j", "requests", "mysql", "mwparserfromhell")
+
+
+def test_import_brain_is_lazy():
+    """Importing brain in a fresh interpreter doesn't load the heavy
+    dependencies
+    """
+    loaded = subprocess.run(
+        [sys.executable, "-c",
+         "import sys, brain; print(' '.join(sorted(sys.modules)))"],
+        cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+    assert not [module for module in loaded
+                if module.split(".")[0] in HEAVY_MODULES]
+
+
+def test_dir_lists_loaded_names_once():
+    """A class loaded on first use is listed once by dir(brain)
+    """
+    names = subprocess.run(
+        [sys.executable, "-c",
+         "import brain; brain.Neo4j; print(' '.join(dir(brain)))"],
+        cwd=ROOT, capture_output=True, text=True, check=True).stdout.split()
+    assert names.count("Neo4j") == 1
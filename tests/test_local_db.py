@@ -0,0 +1,90 @@
+import time
+import pytest
+from brain.naive.local_db import LocalGraph
+
+
+@pytest.fixture
+def graph():
+    graph = LocalGraph()
+    graph.create_edges([{"n1": "dog", "r": "IS_A", "n2": "animal"},
+                        {"n1": "dog", "r": "RELATED_TO", "n2": "cat"},
+                        {"n1": "cat", "r": "IS_A", "n2": "pet"}])
+    return graph
+
+
+def confidence(graph, n1, r, n2):
+    return graph.find_edge(r, "unknown", "unknown", n1, n2)[0]["confidence"]
+
+
+def test_upsert_strengthens_existing_edges(graph):
+    assert confidence(graph, "dog", "IS_A", "animal") == 0.5
+    graph.create_edge("IS_A", "unknown", "unknown", "dog", "animal")
+    graph.create_edges([{"n1": "dog", "r": "IS_A", "n2": "animal",
+                         "count": 2}])
+    # three strengthenings by 10% of what's left
+    assert confidence(graph, "dog", "IS_A", "animal") == \
+        pytest.approx(1 - 0.5 * 0.9 ** 3, abs=0.002)
+    assert graph.find_node("dog") == ["dog"]
+    assert graph.find_edge("IS_A", "unknown", "unknown", "cat", "dog") == []
+
+
+def test_find_all_edge_filters(graph):
+    graph.create_edge("IS_A", "unknown", "unknown", "dog", "animal")
+    edges = graph.find_all_edge(None, "dog", limit=1)
+    assert [(x["n1"], x["r"], x["n2"]) for x in edges] == \
+        [("dog", "IS_A", "animal")]
+    assert {x["n1"] for x in graph.find_all_edge("unknown", "cat")} == \
+        {"dog", "cat"}
+    assert graph.find_all_edge(None, "cat", rel_types=["IS_A"]) == \
+        [{"n1": "cat", "r": "IS_A", "c": 0.5, "n2": "pet"}]
+
+
+def test_recall_spreads_over_hops(graph):
+    recalled = graph.recall(["dog"], hops=2, decay=1.0)
+    by_name = {x["name"]: x for x in recalled}
+    assert by_name["cat"]["activation"] == 0.5
+    assert by_name["pet"]["activation"] == 0.25
+    assert by_name["pet"]["path"] == ["dog", "cat", "pet"]
+    assert "dog" not in by_name
+    assert "pet" not in {x["name"] for x in
+                         graph.recall(["dog"], hops=1, decay=1.0)}
+    assert len(graph.recall(["dog"], hops=2, decay=1.0,
+                            max_frontier=1)) < len(recalled)
+
+
+def test_decay_halves_and_deletes(graph):
+    edges = graph.outgoing[("unknown", "dog")]
+    hour = 3600 * 1000
+    edges[("IS_A", "unknown", "animal")]["updated"] -= hour
+    edges[("RELATED_TO", "unknown", "cat")]["updated"] -= 5 * hour
+    # written by a clock ahead of this one
+    graph.outgoing[("unknown", "cat")][("IS_A", "unknown", "pet")][
+        "updated"] = time.time() * 1000 + hour
+
+    counts = graph.decay(half_life=3600, floor=0.05)
+    assert counts == {"edges": 3, "deleted": 1}
+    assert confidence(graph, "dog", "IS_A", "animal") == \
+        pytest.approx(0.25, abs=0.01)
+    assert confidence(graph, "cat", "IS_A", "pet") == 0.5
+    assert graph.find_edge("RELATED_TO", "unknown", "unknown",
+                           "dog", "cat") == []
+
+
+def test_snapshot_round_trip(graph, tmp_path):
+    path = tmp_path / "graph.snap"
+    graph.export_snapshot(path)
+    copy = LocalGraph()
+    copy.import_snapshot(path)
+    assert sorted((x["n1"], x["r"], x["n2"], x["c"])
+                  for x in copy.find_all_edge(None, "cat")) == \
+        [("cat", "IS_A", "pet", 0.5), ("dog", "RELATED_TO", "cat", 0.5)]
+
+
+def test_sqlite_file_is_reloaded(tmp_path):
+    path = tmp_path / "graph.sqlite"
+    graph = LocalGraph(path=path)
+    graph.create_edges([{"n1": "dog", "r": "IS_A", "n2": "animal"}])
+    graph.close()
+    graph = LocalGraph(path=path)
+    assert confidence(graph, "dog", "IS_A", "animal") == 0.5
+    graph.close()
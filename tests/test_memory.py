@@ -0,0 +1,69 @@
+import pytest
+from brain.scrape.memory import LFU, Memory
+
+
+def test_full_hot_tier_spills_to_disk():
+    memory = Memory(size=10)
+    for i in range(25):
+        memory.put(i, str(i))
+    assert memory.stats["hot_size"] <= 10
+    assert len(memory) == 25
+    assert memory.get(0) == "0"
+    assert memory.stats["cold_hits"] == 1
+    memory.close()
+
+
+def test_lfu_spills_the_least_used():
+    memory = Memory(size=10, policy=LFU)
+    for i in range(10):
+        memory.put(i, i)
+    for _ in range(3):
+        memory.get(0)
+    memory.put(10, 10)
+    assert 0 in memory.hot and 1 not in memory.hot
+    memory.close()
+
+
+def test_most_used_covers_both_tiers():
+    memory = Memory(size=2)
+    for i in range(5):
+        memory.put(i, i)
+    for _ in range(5):
+        memory.get(0)
+    assert memory.most_used(1) == [(0, 0)]
+    memory.close()
+
+
+def test_delete_and_delete_where():
+    memory = Memory(size=2)
+    for i in range(6):
+        memory.put(i, i)
+    assert memory.delete(0) and not memory.delete(0)
+    assert memory.delete_where(lambda key: key % 2 == 1) == 3
+    assert sorted(key for key, _ in memory.scan()) == [2, 4]
+    memory.close()
+
+
+def test_path_is_kept_and_reloaded(tmp_path):
+    path = tmp_path / "memory.sqlite"
+    memory = Memory(size=2, path=path)
+    memory.put("a", [1, 2])
+    memory.close()
+    memory = Memory(size=2, path=path)
+    assert memory.get("a") == [1, 2]
+    memory.close()
+
+
+def test_default_file_is_private_and_removed():
+    first, second = Memory(), Memory()
+    first.put("a", 1)
+    assert "a" not in second
+    path = first.path
+    first.close()
+    second.close()
+    assert not path.exists()
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Memory(policy="fifo")
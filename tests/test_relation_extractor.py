@@ -0,0 +1,24 @@
+import pytest
+from brain.wiki.relation_extractor import RelationPipeline
+
+
+@pytest.mark.parametrize("sentence, relations", [
+    ("The heart is part of the circulatory system.",
+     [("heart", "PART_OF", "circulatory_system")]),
+    ("Paris is located in France and is big.",
+     [("paris", "AT_LOCATION", "france")]),
+    ("A knife can be used to cut bread.",
+     [("knife", "USED_FOR", "cut_bread")]),
+    ("A pen is used for writing.",
+     [("pen", "USED_FOR", "writing")]),
+    ("An apple can be eaten.",
+     [("apple", "RECIEVES_ACTION", "eaten")]),
+    ("Birds can fly.",
+     [("birds", "CAPABLE_OF", "fly")]),
+    ("Cooking requires a stove, but eating does not.",
+     [("cooking", "HAS_PREREQUISITE", "stove")]),
+    ("It was a sunny day.", []),
+])
+def test_extract(sentence, relations):
+    found = RelationPipeline.extract(sentence)
+    assert [(x["n1"], x["r"], x["n2"]) for x in found] == relations
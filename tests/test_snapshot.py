@@ -0,0 +1,45 @@
+import gzip
+import pytest
+from brain.naive.snapshot import SnapshotWriter, read_snapshot
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / "graph.snap"
+    with SnapshotWriter(path, block_size=2) as writer:
+        dog = writer.add_node(name="dog", label="Animal")
+        cat = writer.add_node(name="cat", label="Animal")
+        pet = writer.add_node(name="pet", label="unknown")
+        writer.add_edge(dog, "IS_A", pet, confidence=0.75)
+        writer.add_edge(cat, "IS_A", pet)
+        writer.add_edge(dog, "RELATED_TO", cat, confidence=0.5)
+    assert (writer.node_count, writer.edge_count) == (3, 3)
+
+    nodes, edges = [], []
+    for kind, rows in read_snapshot(path):
+        (nodes if kind == "nodes" else edges).extend(rows)
+    assert nodes == [{"name": "dog", "label": "Animal"},
+                     {"name": "cat", "label": "Animal"},
+                     {"name": "pet", "label": "unknown"}]
+    assert edges == [
+        {"n1": "dog", "t1": "Animal", "r": "IS_A", "n2": "pet",
+         "t2": "unknown", "confidence": 0.75},
+        {"n1": "cat", "t1": "Animal", "r": "IS_A", "n2": "pet",
+         "t2": "unknown", "confidence": None},
+        {"n1": "dog", "t1": "Animal", "r": "RELATED_TO", "n2": "cat",
+         "t2": "Animal", "confidence": 0.5}]
+
+
+def test_unicode_names(tmp_path):
+    path = tmp_path / "graph.snap"
+    with SnapshotWriter(path) as writer:
+        writer.add_node(name="café", label="日本")
+    assert list(read_snapshot(path)) == [
+        ("nodes", [{"name": "café", "label": "日本"}])]
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / "graph.snap"
+    with gzip.open(str(path), "wb") as file:
+        file.write(b"NOTASNAPSHOT")
+    with pytest.raises(ValueError):
+        list(read_snapshot(path))
@@ -0,0 +1,69 @@
+import pytest
+from brain.naive.write_buffer import EdgeWriteBuffer
+
+
+def edge(n1, n2, r="RELATED_TO"):
+    return {"n1": n1, "r": r, "n2": n2, "t1": "unknown", "t2": "unknown"}
+
+
+@pytest.fixture
+def writes():
+    """Batches given to write, with a buffer that only flushes when asked
+    """
+    batches = []
+    buffer = EdgeWriteBuffer(write=batches.append,
+                             max_pending=1000,
+                             flush_interval=None,
+                             batch_size=2)
+    yield buffer, batches
+    buffer.close()
+
+
+def test_repeated_edges_are_coalesced(writes):
+    buffer, batches = writes
+    for _ in range(3):
+        buffer.add(edge("a", "b"))
+    buffer.add(dict(edge("a", "b"), count=2))
+    buffer.add(edge("b", "a"))
+
+    assert buffer.flush() == 2
+    counts = {(x["n1"], x["n2"]): x["count"]
+              for batch in batches for x in batch}
+    assert counts == {("a", "b"): 5, ("b", "a"): 1}
+    assert buffer.queued == 6 and buffer.written == 2
+    assert buffer.flush() == 0
+
+
+def test_failed_batch_and_later_ones_are_queued_again():
+    batches = []
+
+    def write(batch):
+        if len(batches) == 1:
+            raise ConnectionError("database went away")
+        batches.append(batch)
+
+    buffer = EdgeWriteBuffer(write=write,
+                             max_pending=1000,
+                             flush_interval=None,
+                             batch_size=2)
+    for name in "abcdef":
+        buffer.add(edge(name, "z"))
+    with pytest.raises(ConnectionError):
+        buffer.flush()
+    assert [x["n1"] for x in batches[0]] == ["a", "b"]
+    assert len(buffer.pending) == 4
+
+    # the written batch isn't strengthened again by the retry
+    buffer.add(edge("c", "z"))
+    buffer.write = batches.append
+    assert buffer.flush() == 4
+    counts = {x["n1"]: x["count"] for batch in batches for x in batch}
+    assert counts == {"a": 1, "b": 1, "c": 2, "d": 1, "e": 1, "f": 1}
+    buffer.close()
+
+
+def test_close_writes_what_is_left(writes):
+    buffer, batches = writes
+    buffer.add(edge("a", "b"))
+    buffer.close()
+    assert [x["n1"] for batch in batches for x in batch] == ["a"]